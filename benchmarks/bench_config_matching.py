@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+# bench_config_matching.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Compares line matching throughput on a 2,000 line config.txt, before and
+# after the switch to the shared matcher layer.
+#
+# Usage: python benchmarks/bench_config_matching.py
+#
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from kano_settings.boot_config import BootConfigDocument
+from kano_settings.config_file import file_replace
+
+
+LINE_COUNT = 2000
+ROUNDS = 20
+OPTIONS = ['hdmi_group', 'hdmi_mode', 'disable_overscan', 'overscan_left',
+           'overscan_right', 'overscan_top', 'overscan_bottom',
+           'config_hdmi_boost', 'hdmi_force_hotplug']
+
+
+def generate_config():
+    lines = []
+    for i in xrange(LINE_COUNT):
+        if i % 10 == 0:
+            lines.append('# comment line {}'.format(i))
+        elif i % 250 == 0:
+            lines.append('[pi{}]'.format(1 + i % 2))
+        else:
+            lines.append('option_{}={}'.format(i, i))
+    return lines
+
+
+def legacy_set_values(lines, values):
+    # The old BootConfig.set_value: one string regex per line per option
+    for name, value in values:
+        option_re = r'^\s*#?\s*' + str(name) + r'=(.*)'
+        new_lines = []
+        for line in lines:
+            if re.match(option_re, line):
+                line = str(name) + '=' + str(value)
+            new_lines.append(line)
+        lines = new_lines
+    return lines
+
+
+def document_set_values(lines, values):
+    document = BootConfigDocument(lines)
+    for name, value in values:
+        document.set_value(name, value)
+    return document.to_lines()
+
+
+def legacy_file_replace(fname, pat, s_after):
+    with open(fname) as f:
+        if not any(re.search(pat, line) for line in f):
+            return -1
+
+    with open(fname) as f:
+        out = open(fname + '.tmp', 'w')
+        for line in f:
+            out.write(re.sub(pat, s_after, line))
+        out.close()
+        os.rename(fname + '.tmp', fname)
+
+
+def measure(name, func, lines_per_round):
+    start = time.time()
+    for _ in xrange(ROUNDS):
+        func()
+    elapsed = time.time() - start
+    print '{:<32} {:>12.0f} lines/sec'.format(
+        name, lines_per_round * ROUNDS / elapsed)
+
+
+def main():
+    lines = generate_config()
+    values = [(name, 1) for name in OPTIONS]
+
+    # The legacy path scans the whole file once per option
+    measure('config.txt set, legacy',
+            lambda: legacy_set_values(lines, values),
+            LINE_COUNT * len(values))
+    measure('config.txt set, document',
+            lambda: document_set_values(lines, values),
+            LINE_COUNT * len(values))
+
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'desktop.conf')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    try:
+        measure('file_replace, legacy',
+                lambda: legacy_file_replace(path, r'option_1[0-9]+=', 'x='),
+                LINE_COUNT)
+        measure('file_replace, single pass',
+                lambda: file_replace(path, r'option_1[0-9]+=', 'x='),
+                LINE_COUNT)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# bench_display_rules.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Replays recorded screens through the display autoconfig rules, printing
+# the change set for each one and how long deciding it took.
+#
+# Usage: python benchmarks/bench_display_rules.py [screen.log ...]
+#
+# Every record of a /boot/screen.log written by kano-settings-onboot is
+# replayed. Without arguments the fixtures of the test suite are used.
+#
+
+import os
+import sys
+import glob
+import json
+import time
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from kano_settings.system.display_rules import DisplayRules
+from kano_settings.system.screen_history import read_records
+
+
+ROUNDS = 10000
+FIXTURES = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', 'tests', 'display', 'fixtures', '*.json'))
+
+
+def decide(rules, screen):
+    targets = rules.targets(screen['edid'], screen['model'],
+                            screen.get('edid_id'))
+    return rules.changes(screen['status'], targets)
+
+
+def load_fixtures():
+    screens = []
+    for path in sorted(glob.glob(FIXTURES)):
+        with open(path) as f:
+            screens.append((os.path.basename(path), json.load(f)))
+    return screens
+
+
+def load_logs(paths):
+    """ The records of each log, leaving out the rotated ones """
+
+    screens = []
+    for path in paths:
+        for record in read_records(path, rotations=0):
+            # The display didn't answer when this one was recorded
+            if not record.get('edid') or not record.get('status'):
+                continue
+
+            label = '{} {}'.format(
+                time.strftime('%Y-%m-%d %H:%M',
+                              time.localtime(record['time'])),
+                record.get('model') or '(unknown)')
+            screens.append((label, record))
+    return screens
+
+
+def main():
+    if sys.argv[1:]:
+        screens = load_logs(sys.argv[1:])
+    else:
+        screens = load_fixtures()
+
+    start = time.time()
+    rules = DisplayRules.load()
+    print 'rules loaded in {:.3f} ms'.format((time.time() - start) * 1000)
+
+    for label, screen in screens:
+        start = time.time()
+        for _ in xrange(ROUNDS):
+            changes, reasons = decide(rules, screen)
+        elapsed = time.time() - start
+
+        print '{:<36} {:>8.2f} us/decision  {}'.format(
+            label, elapsed * 1e6 / ROUNDS,
+            ', '.join('{}={}'.format(k, v) for k, v in changes.iteritems())
+            or 'no changes')
+
+
+if __name__ == '__main__':
+    main()
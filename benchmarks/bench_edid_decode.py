@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# bench_edid_decode.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Compares decoding an EDID in process with the edidparser round trip.
+#
+# Usage: python benchmarks/bench_edid_decode.py [edid.dat]
+#
+# Without an argument a synthetic HDMI TV EDID is used. The edidparser path
+# is only measured where the binary is installed, i.e. on a Pi.
+#
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from kano_settings.system.edid import decode_edid
+from tests.display.test_edid import TV
+
+
+ROUNDS = 200
+
+
+def edidparser_available():
+    with open(os.devnull, 'w') as devnull:
+        try:
+            subprocess.call(['edidparser'], stdout=devnull, stderr=devnull)
+        except OSError:
+            return False
+    return True
+
+
+def measure(name, func):
+    start = time.time()
+    for _ in xrange(ROUNDS):
+        func()
+    elapsed = time.time() - start
+    print '{:<32} {:>12.3f} ms/decode'.format(name, elapsed * 1000 / ROUNDS)
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            data = f.read()
+    else:
+        data = TV
+
+    measure('decode_edid', lambda: decode_edid(data))
+
+    if not edidparser_available():
+        print 'edidparser not found, skipping the subprocess path'
+        return
+
+    fd, path = tempfile.mkstemp(prefix='bench-edid-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+
+    try:
+        # What read_edid() used to do for every call, minus the tvservice
+        # dump which both paths need when there is no sysfs EDID
+        measure('edidparser subprocess',
+                lambda: subprocess.check_output(['edidparser', path]))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
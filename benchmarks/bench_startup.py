@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+# bench_startup.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Measures the wall clock time of the imports kano-settings does before its
+# window appears, and what probing the display for HDMI audio on import
+# used to add on top of that.
+#
+# Usage: python benchmarks/bench_startup.py [module]
+#
+# The default module is kano_settings.system.audio, which main_window and
+# kano-settings-onboot both import. Run it on a Pi with a display attached
+# to see the probe cost.
+#
+
+import os
+import sys
+import time
+import subprocess
+
+
+ROUNDS = 10
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def run(code):
+    start = time.time()
+    subprocess.check_call([sys.executable, '-c', code], cwd=ROOT)
+    return time.time() - start
+
+
+def measure(name, code):
+    times = sorted(run(code) for _ in xrange(ROUNDS))
+    print '{:<32} {:>10.1f} ms (median of {})'.format(
+        name, times[len(times) / 2] * 1000, ROUNDS)
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else \
+        'kano_settings.system.audio'
+
+    measure('import, lazy probe', 'import {}'.format(module))
+
+    # What every import cost before the probe became lazy
+    measure('import, eager probe',
+            'import {}\n'
+            'from kano_settings.system.audio import is_hdmi_audio_supported\n'
+            'is_hdmi_audio_supported()'.format(module))
+
+
+if __name__ == '__main__':
+    main()
@@ -8,12 +8,13 @@
 # Functions controlling reading and writing to /boot/config.txt
 #
 
-import re
 import os
 import sys
 import shutil
+from contextlib import contextmanager
 from kano.utils import read_file_contents_as_lines, is_number
 from kano.logging import logger
+from kano_settings.line_matcher import match_option, match_section
 
 boot_config_standard_path = "/boot/config.txt"
 boot_config_pi1_backup_path = "/boot/config_pi1_backup.txt"
@@ -22,9 +23,198 @@ tvservice_path = '/usr/bin/tvservice'
 boot_config_safemode_backup_path = '/boot/config.txt.orig'
 
 
+marker_prefix = '### '
+
+LINE_OTHER = 0
+LINE_OPTION = 1
+LINE_MARKER = 2
+LINE_SECTION = 3
+
+# Conditional filters which switch back to unconditional options
+unconditional_sections = ('all',)
+
+
+def normalise_section(section):
+    """ Lines outside any filter and lines after `[all]` share one scope. """
+
+    if section is None or section.lower() in unconditional_sections:
+        return None
+    return section.lower()
+
+
+class BootConfigLine(object):
+    """ A single line of config.txt, parsed once when the file is loaded.
+
+        The original text is kept verbatim so that lines we never touch are
+        written back byte for byte.
+    """
+
+    __slots__ = ('text', 'kind', 'name', 'value', 'commented', 'section')
+
+    def __init__(self, text, section=None):
+        self.text = text
+        self.kind = LINE_OTHER
+        self.name = None
+        self.value = None
+        self.commented = False
+        self.section = section
+
+        if text.startswith(marker_prefix):
+            self.kind = LINE_MARKER
+            return
+
+        section = match_section(text)
+        if section is not None:
+            self.kind = LINE_SECTION
+            self.section = normalise_section(section)
+            return
+
+        option = match_option(text)
+        if option:
+            self.kind = LINE_OPTION
+            self.commented, self.name, self.value = option
+
+
+class BootConfigDocument(object):
+    """ In-memory model of config.txt.
+
+        Options, `###` markers, comments and section filters such as
+        `[pi2]` are parsed in a single pass. All mutations are applied to
+        the model, the caller decides when to write it back.
+    """
+
+    def __init__(self, lines=None):
+        self.lines = []
+        self._index = None
+        section = None
+        for text in lines or []:
+            line = BootConfigLine(text, section)
+            section = line.section
+            self.lines.append(line)
+
+    def index(self):
+        """ Map each active (section, option) to (line index, value).
+
+            The map is built in one pass. Only the first uncommented
+            occurrence of an option within a section counts, the same one
+            get_value() has always returned. Unconditional options use None
+            as their section.
+        """
+
+        if self._index is None:
+            self._index = {}
+            for idx, line in enumerate(self.lines):
+                if line.kind != LINE_OPTION or line.commented or \
+                        not line.text.startswith(line.name + '='):
+                    continue
+
+                key = (line.section, line.name)
+                if key in self._index:
+                    continue
+
+                value = line.value.split('=')[0]
+                if is_number(value):
+                    value = int(value)
+                self._index[key] = (idx, value)
+
+        return self._index
+
+    def is_empty(self):
+        return not self.lines
+
+    def to_lines(self):
+        return [line.text for line in self.lines]
+
+    def has_value(self, name, section=None):
+        return (normalise_section(section), name) in self.index()
+
+    def get_value(self, name, section=None):
+        """ Return the value the firmware uses for `name` under `section`.
+
+            An option set inside the section overrides the unconditional
+            one, e.g. `arm_freq` in `[pi2]` wins over a plain `arm_freq` on
+            a Pi 2.
+        """
+
+        index = self.index()
+        section = normalise_section(section)
+
+        entry = None
+        if section is not None:
+            entry = index.get((section, name))
+        if entry is None:
+            entry = index.get((None, name))
+        if entry is None:
+            return 0
+
+        return entry[1]
+
+    def set_value(self, name, value=None, section=None):
+        # if the value argument is None, the option will be commented out
+        name = str(name)
+        section = normalise_section(section)
+        if value is not None:
+            new_text = name + '=' + str(value)
+        else:
+            new_text = '#' + name + '=0'
+
+        was_found = False
+        for idx, line in enumerate(self.lines):
+            if line.kind == LINE_OPTION and line.name == name and \
+                    line.section == section:
+                was_found = True
+                self.lines[idx] = BootConfigLine(new_text, section)
+
+        if not was_found and value is not None:
+            self._add_to_section(new_text, section)
+
+        self._index = None
+
+    def _add_to_section(self, text, section):
+        if section is None:
+            # Unconditional options go at the end of the file, but not
+            # inside a filter the file happens to end with
+            if self.lines and self.lines[-1].section is not None:
+                self.lines.append(BootConfigLine('[all]'))
+            self.lines.append(BootConfigLine(text, None))
+            return
+
+        last_idx = None
+        for idx, line in enumerate(self.lines):
+            if line.section == section:
+                last_idx = idx
+
+        if last_idx is not None:
+            self.lines.insert(last_idx + 1, BootConfigLine(text, section))
+        else:
+            self.lines.append(BootConfigLine('[{}]'.format(section)))
+            self.lines.append(BootConfigLine(text, section))
+            self.lines.append(BootConfigLine('[all]'))
+
+    def set_comment(self, name, value):
+        comment_str_full = '{}{}: {}'.format(marker_prefix, name, value)
+        comment_str_name = '{}{}'.format(marker_prefix, name)
+
+        self.lines = [l for l in self.lines if comment_str_name not in l.text]
+        self.lines.insert(0, BootConfigLine(comment_str_full))
+        self._index = None
+
+    def get_comment(self, name, value):
+        comment_str_full = '{}{}: {}'.format(marker_prefix, name, value)
+        return any(l.text == comment_str_full for l in self.lines)
+
+    def has_comment(self, name):
+        comment_start = '{}{}:'.format(marker_prefix, name)
+        return any(l.text.startswith(comment_start) for l in self.lines)
+
+
 class BootConfig:
     def __init__(self, path=boot_config_standard_path):
         self.path = path
+        self._document = None
+        self._signature = None
+        self._transaction_depth = 0
+        self._transaction_dirty = False
 
     def exists(self):
         return os.path.exists(self.path)
@@ -34,88 +224,209 @@ class BootConfig:
             f = open(self.path, "w")
             print >>f, "#"  # otherwise set_value thinks the file should not be written to
             f.close()  # make file, even if empty
+            self.invalidate()
 
-    def set_value(self, name, value=None):
-        # if the value argument is None, the option will be commented out
-        lines = read_file_contents_as_lines(self.path)
-        if not lines:  # this is true if the file is empty, not sure that was intended.
-            return
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
 
-        logger.info('writing value to {} {} {}'.format(self.path, name, value))
+        return (st.st_mtime, st.st_size, st.st_ino)
 
-        option_re = r'^\s*#?\s*' + str(name) + r'=(.*)'
+    def load(self):
+        """ Parse the file into a BootConfigDocument in a single read. """
 
-        with open(self.path, "w") as boot_config_file:
-            was_found = False
+        self._signature = self._stat_signature()
+        self._document = BootConfigDocument(
+            read_file_contents_as_lines(self.path)
+        )
+        return self._document
 
-            for line in lines:
-                if re.match(option_re, line):
-                    was_found = True
-                    if value is not None:
-                        replace_str = str(name) + "=" + str(value)
-                    else:
-                        replace_str = r'#' + str(name) + r'=0'
-                    new_line = replace_str
-                else:
-                    new_line = line
+    def document(self):
+        """ Return the parsed file, reparsing it only if it changed on disk.
 
-                boot_config_file.write(new_line + "\n")
+            A cached copy is revalidated with a single stat() of the file.
+            Inside a transaction the staged copy is always used.
+        """
 
-            if not was_found and value is not None:
-                boot_config_file.write(str(name) + "=" + str(value) + "\n")
+        # changed_on_disk() may drop the copy while we look at it
+        document = self._document
+        if document is None:
+            return self.load()
 
-    def get_value(self, name):
-        lines = read_file_contents_as_lines(self.path)
-        if not lines:
-            return 0
+        if not self._transaction_depth and \
+                self._stat_signature() != self._signature:
+            return self.load()
 
-        for l in lines:
-            if l.startswith(name + '='):
-                value = l.split('=')[1]
-                if is_number(value):
-                    value = int(value)
-                return value
+        return document
+
+    def invalidate(self):
+        """ Drop the parsed copy, e.g. after the file was replaced. """
+
+        self._document = None
+        self._signature = None
+
+    def changed_on_disk(self):
+        """ Forget the parsed copy unless a transaction is staging edits.
+
+            Notifications about our own writes, where the file is still
+            the one we saved, are ignored.
+        """
+
+        if self._transaction_depth or \
+                self._stat_signature() == self._signature:
+            return
+
+        self.invalidate()
+
+    def save(self, document):
+        """ Write the document back in one go.
+
+            The new contents go to a temporary file on the same partition
+            which is fsynced and then renamed over the original, so a power
+            cut leaves either the old or the new config, never a truncated
+            one.
+        """
+
+        write_lines_durably(self.path, document.to_lines())
+        self._document = document
+        self._signature = self._stat_signature()
+
+    def write_copy(self, path):
+        """ Write the current (possibly staged) contents to another file. """
+
+        write_lines_durably(path, self.document().to_lines())
+
+    @contextmanager
+    def transaction(self):
+        """ Stage every change made in the block and write them in one go.
+
+            Nested transactions join the outermost one. If the block raises,
+            the staged changes are discarded and the file is left untouched.
+        """
+
+        self._transaction_depth += 1
+        try:
+            yield self
+        except Exception:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._transaction_dirty = False
+                self.invalidate()
+            raise
+
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0 and self._transaction_dirty:
+            self._transaction_dirty = False
+            logger.info('committing transaction to {}'.format(self.path))
+            try:
+                # The staged copy, document() would reload a file which
+                # changed during the block and lose the edits
+                self.save(self._document)
+            except Exception:
+                self.invalidate()
+                raise
+
+    def _commit(self, document):
+        if self._transaction_depth:
+            self._transaction_dirty = True
+        else:
+            self.save(document)
+
+    def set_value(self, name, value=None, section=None):
+        self.set_values([(name, value)], section)
+
+    def set_values(self, values, section=None):
+        """ Apply several options with one read and one write of the file.
+
+            `values` is either a dict or a sequence of (name, value) pairs;
+            use the latter when the order of newly appended options matters.
+            With a `section` such as 'pi2' the options are written under
+            that conditional filter and the unconditional ones are left
+            alone.
+        """
+
+        if isinstance(values, dict):
+            values = values.items()
+
+        document = self.document()
+        if document.is_empty():  # this is true if the file is empty, not sure that was intended.
+            return
 
-        return 0
+        try:
+            for name, value in values:
+                logger.info('writing value to {} {} {} {}'.format(
+                    self.path, section or '', name, value))
+                document.set_value(name, value, section)
+
+            self._commit(document)
+        except Exception:
+            self.invalidate()
+            raise
+
+    def get_value(self, name, section=None):
+        return self.document().get_value(name, section)
+
+    def get_values(self, names, section=None):
+        """ Several values read from the same snapshot of the file """
+        document = self.document()
+        return dict((name, document.get_value(name, section))
+                    for name in names)
+
+    def has_value(self, name, section=None):
+        return self.document().has_value(name, section)
 
     def set_comment(self, name, value):
-        lines = read_file_contents_as_lines(self.path)
-        if not lines:
+        document = self.document()
+        if document.is_empty():
             return
 
         logger.info('writing comment to {} {} {}'.format(self.path, name, value))
 
-        comment_str_full = '### {}: {}'.format(name, value)
-        comment_str_name = '### {}'.format(name)
+        try:
+            document.set_comment(name, value)
+            self._commit(document)
+        except Exception:
+            self.invalidate()
+            raise
+
+    def get_comment(self, name, value):
+        return self.document().get_comment(name, value)
 
-        with open(self.path, "w") as boot_config_file:
-            boot_config_file.write(comment_str_full + '\n')
+    def has_comment(self, name):
+        return self.document().has_comment(name)
 
-            for line in lines:
-                if comment_str_name in line:
-                    continue
 
-                boot_config_file.write(line + '\n')
+def write_lines_durably(path, lines):
+    """ Atomically replace `path` with `lines`. """
+    write_file_durably(path, ''.join(line + '\n' for line in lines))
 
-    def get_comment(self, name, value):
-        lines = read_file_contents_as_lines(self.path)
-        if not lines:
-            return False
 
-        comment_str_full = '### {}: {}'.format(name, value)
-        return comment_str_full in lines
+def write_file_durably(path, contents):
+    """ Atomically replace `path` with `contents`.
 
-    def has_comment(self, name):
-        lines = read_file_contents_as_lines(self.path)
-        if not lines:
-            return False
+        /boot is a FAT partition on an SD card, so the data is fsynced
+        before the rename and the directory is fsynced after it to make
+        the rename itself durable.
+    """
 
-        comment_start = '### {}:'.format(name)
-        for l in lines:
-            if l.startswith(comment_start):
-                return True
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as tmp_file:
+        tmp_file.write(contents)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
 
-        return False
+    os.rename(tmp_path, path)
+
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError as e:
+        logger.warn('could not sync the directory of {}: {}'.format(path, e))
 
 
 real_config = BootConfig()
@@ -123,12 +434,28 @@ pi1_backup_config = BootConfig(boot_config_pi1_backup_path)
 pi2_backup_config = BootConfig(boot_config_pi2_backup_path)
 
 
-def set_config_value(name, value=None):
-    real_config.set_value(name, value)
+def set_config_value(name, value=None, section=None):
+    real_config.set_value(name, value, section)
+
+
+def set_config_values(values, section=None):
+    real_config.set_values(values, section)
+
+
+def transaction():
+    return real_config.transaction()
+
+
+def get_config_value(name, section=None):
+    return real_config.get_value(name, section)
+
+
+def get_config_values(names, section=None):
+    return real_config.get_values(names, section)
 
 
-def get_config_value(name):
-    return real_config.get_value(name)
+def has_config_value(name, section=None):
+    return real_config.has_value(name, section)
 
 
 def set_config_comment(name, value):
@@ -158,9 +485,11 @@ def is_safe_boot():
 
 
 def safe_mode_backup_config():
-    shutil.copy2(boot_config_standard_path, boot_config_safemode_backup_path)
+    # Copy from memory so that changes staged in a transaction are kept
+    real_config.write_copy(boot_config_safemode_backup_path)
 
 
 def safe_mode_restore_config():
     shutil.move(boot_config_safemode_backup_path, boot_config_standard_path)
+    real_config.invalidate()
 
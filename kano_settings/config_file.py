@@ -9,60 +9,24 @@
 #
 
 import os
-import re
 import shutil
-from kano.utils import ensure_dir, get_user_unsudoed, read_json, write_json, chown_path
+from contextlib import contextmanager
+from kano.utils import ensure_dir, get_user_unsudoed, chown_path
 from kano.logging import logger
 from kano_settings.common import settings_dir
 from kano.utils import is_model_2_b
+from kano_settings.line_matcher import replace_lines
+from kano_settings.boot_config import write_file_durably
+from kano_settings.settings_schema import SCHEMA, BOARDS, get_defaults, \
+    load_settings, encode_settings
 
 USER = None
 USER_ID = None
 
-username = get_user_unsudoed()
-if username != 'root':
-    if os.path.exists(settings_dir) and os.path.isfile(settings_dir):
-        os.rename(settings_dir, settings_dir + '.bak')
-    ensure_dir(settings_dir)
-    chown_path(settings_dir)
-    settings_file = os.path.join(settings_dir, 'settings')
-
-defaults = {
-    'pi1': {
-        'Keyboard-continent-index': 1,
-        'Keyboard-country-index': 21,
-        'Keyboard-variant-index': 0,
-        'Keyboard-continent-human': 'america',
-        'Keyboard-country-human': 'United States',
-        'Keyboard-variant-human': 'Generic',
-        'Audio': 'Analogue',
-        'Wifi': '',
-        'Wifi-connection-attempted': False,
-        'Overclocking': 'High',
-        'Mouse': 'Normal',
-        'Font': 'Normal',
-        'Wallpaper': 'kanux-background',
-        'Parental-level': 0,
-        'Locale': 'en_US'
-    },
-    'pi2': {
-        'Keyboard-continent-index': 1,
-        'Keyboard-country-index': 21,
-        'Keyboard-variant-index': 0,
-        'Keyboard-continent-human': 'america',
-        'Keyboard-country-human': 'United States',
-        'Keyboard-variant-human': 'Generic',
-        'Audio': 'Analogue',
-        'Wifi': '',
-        'Wifi-connection-attempted': False,
-        'Overclocking': 'Standard',
-        'Mouse': 'Normal',
-        'Font': 'Normal',
-        'Wallpaper': 'kanux-background',
-        'Parental-level': 0,
-        'Locale': 'en_US'
-    }
-}
+settings_file = os.path.join(settings_dir, 'settings')
+
+# Per board defaults, generated from the settings schema
+defaults = dict((board, get_defaults(board)) for board in BOARDS)
 
 
 def file_replace(fname, pat, s_after):
@@ -75,43 +39,209 @@ def file_replace(fname, pat, s_after):
         # pat = re.escape(pat)
         # logger.debug('config_file / file_replace replacing pattern, new pattern: "{}"'.format(pat))
 
-    # See if the pattern is even in the file.
+    # Replace in a single pass, counting the matches as we go.
     with open(fname) as f:
-        if not any(re.search(pat, line) for line in f):
-            logger.debug('config_file / file_replace pattern does not occur in file')
-            return -1  # pattern does not occur in file so we are done.
+        lines, count = replace_lines(f, pat, s_after)
 
-    # pattern is in the file, so perform replace operation.
-    with open(fname) as f:
-        out_fname = fname + ".tmp"
-        out = open(out_fname, "w")
-        for line in f:
-            out.write(re.sub(pat, s_after, line))
-        out.close()
+    if not count:
+        logger.debug('config_file / file_replace pattern does not occur in file')
+        return -1  # pattern does not occur in file so we are done.
+
+    # pattern is in the file, so write the result out.
+    out_fname = fname + ".tmp"
+    with open(out_fname, "w") as out:
+        out.writelines(lines)
 
-        # preserving permissions from the old file
-        shutil.copystat(fname, out_fname)
+    # preserving permissions from the old file
+    shutil.copystat(fname, out_fname)
 
-        # overwriting the old file with the new one
-        os.rename(out_fname, fname)
+    # overwriting the old file with the new one
+    os.rename(out_fname, fname)
 
     logger.debug('config_file / file_replace file replaced')
 
 
+_pi_key = None
+
+
 def get_pi_key():
-    pi2 = is_model_2_b()
+    # The board can't change while we run, so only probe it once
+    global _pi_key
+
+    if _pi_key is None:
+        if is_model_2_b():
+            _pi_key = "pi2"
+        else:
+            _pi_key = "pi1"
+
+    return _pi_key
+
+
+def _same_value(old, new):
+    # JSON gives back unicode for str, but True == 1 and 3 == 3.0 must
+    # still count as changes
+    if isinstance(old, basestring) and isinstance(new, basestring):
+        return old == new
+    return type(old) == type(new) and old == new
+
+
+class SettingsStore(object):
+    """ Keeps the user's settings file in memory and writes it back only
+        when something actually changed.
+
+        Reads are served from memory for as long as a stat() of the file
+        shows it unchanged. Several updates can be grouped with
+        set_settings() or batch() so the file is written, and chowned, once
+        for all of them.
+    """
+
+    def __init__(self, path=settings_file, compact=True):
+        self.path = path
+        self.compact = compact
+        self._data = None
+        self._signature = None
+        self._username = None
+        self._batch_depth = 0
+        self._dirty = False
+
+    def username(self):
+        if self._username is None:
+            self._username = get_user_unsudoed()
+        return self._username
+
+    def is_writable(self):
+        # root has no settings of its own
+        return self.username() != 'root'
+
+    def _ensure_settings_dir(self):
+        directory = os.path.dirname(self.path)
+        if os.path.exists(directory) and os.path.isfile(directory):
+            os.rename(directory, directory + '.bak')
+        ensure_dir(directory)
+        chown_path(directory)
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+
+        return (st.st_mtime, st.st_size, st.st_ino)
+
+    def load(self):
+        """ Parse the file, checking every value against the schema once """
+
+        data = dict()
+        self._signature = self._stat_signature()
+        if self.is_writable():
+            data = load_settings(self.path)
+
+        self._data = data
+        return self._data
+
+    def data(self):
+        """ The settings, reparsed only if the file changed on disk.
+
+            Inside a batch the in-memory copy, with its pending changes,
+            is always used.
+        """
 
-    key = "pi1"
-    if pi2:
-        key = "pi2"
+        # changed_on_disk() may drop the copy while we look at it
+        data = self._data
+        if data is None:
+            return self.load()
 
-    return key
+        if not self._batch_depth and \
+                self._stat_signature() != self._signature:
+            return self.load()
+
+        return data
+
+    def changed_on_disk(self):
+        """ Forget the cached copy unless it holds unsaved changes.
+
+            Notifications about our own writes, where the file is still
+            the one we saved, are ignored.
+        """
+
+        if self._batch_depth or self._stat_signature() == self._signature:
+            return
+
+        self._data = None
+        self._signature = None
+
+    def get(self, variable):
+        """ Raises KeyError if the variable was never saved """
+        return self.data()[variable]
+
+    @contextmanager
+    def batch(self):
+        """ Collect every set_settings() call in the block into one write """
+
+        if not self._batch_depth:
+            # Start from what is on disk so we don't undo changes made by
+            # another process since we last read the file
+            self.data()
+
+        self._batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                # Drop the half applied changes
+                self._data = None
+                self._signature = None
+                self._dirty = False
+            raise
+
+        self._batch_depth -= 1
+        if not self._batch_depth and self._dirty:
+            self.flush()
+
+    def set_settings(self, values):
+        if not self.is_writable():
+            return
+
+        with self.batch():
+            data = self.data()
+            for variable, value in values.iteritems():
+                logger.debug('config_file / set_setting: {} {}'.format(variable, value))
+
+                if variable in SCHEMA:
+                    try:
+                        value = SCHEMA[variable].validate(value)
+                    except ValueError as e:
+                        logger.error('config_file / set_setting: {}'.format(e))
+                        continue
+
+                if variable in data and _same_value(data[variable], value):
+                    continue
+
+                data[variable] = value
+                self._dirty = True
+
+    def flush(self):
+        """ Atomically replace the settings file with the in-memory copy """
+
+        self._ensure_settings_dir()
+
+        # Not data(), which would reload a file changed by someone else
+        # during the batch and drop the pending changes
+        write_file_durably(self.path,
+                           encode_settings(self._data, self.compact))
+        chown_path(self.path)
+        self._signature = self._stat_signature()
+        self._dirty = False
+
+
+settings_store = SettingsStore()
 
 
 def get_setting(variable):
 
     try:
-        value = read_json(settings_file)[variable]
+        value = settings_store.get(variable)
     except Exception:
         key = get_pi_key()
         if variable not in defaults[key]:
@@ -120,17 +250,22 @@ def get_setting(variable):
     return value
 
 
+def get_all_settings():
+    """ Every known setting, with defaults filled in for missing ones """
+
+    settings = dict(defaults[get_pi_key()])
+    settings.update(settings_store.data())
+    return settings
+
+
 def set_setting(variable, value):
+    settings_store.set_settings({variable: value})
 
-    if username == 'root':
-        return
 
-    logger.debug('config_file / set_setting: {} {}'.format(variable, value))
+def set_settings(values):
+    """ Save several settings with a single write of the settings file """
+    settings_store.set_settings(values)
 
-    data = read_json(settings_file)
-    if not data:
-        data = dict()
 
-    data[variable] = value
-    write_json(settings_file, data)
-    chown_path(settings_file)
+def settings_batch():
+    return settings_store.batch()
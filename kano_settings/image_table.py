@@ -8,10 +8,10 @@
 
 import os
 from gi.repository import Gtk, GdkPixbuf, GObject
-from kano_settings.config_file import username
+from kano.utils import get_user_unsudoed
 
 wallpaper_path = "/usr/share/kano-desktop/wallpapers/"
-kano_draw_path = os.path.join('/home', username, 'Draw-content/wallpapers/')
+kano_draw_path = os.path.join('/home', get_user_unsudoed(), 'Draw-content/wallpapers/')
 padlock_path = "/usr/share/kano-settings/media/Icons/padlock.png"  # needs to be 95x95
 name_pattern = "-4-3.png"
 
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# line_matcher.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Shared helpers for matching and rewriting lines of config files
+#
+
+import re
+from collections import OrderedDict
+
+
+PATTERN_CACHE_SIZE = 64
+
+_pattern_cache = OrderedDict()
+
+
+def compile_pattern(pattern, flags=0):
+    """ Return a compiled regex, reusing recently compiled ones.
+
+        The `re` module's own cache is small and gets flushed wholesale when
+        it fills up, so callers which match many lines against a handful of
+        patterns keep theirs here instead.
+    """
+
+    key = (pattern, flags)
+    try:
+        compiled = _pattern_cache.pop(key)
+    except KeyError:
+        compiled = re.compile(pattern, flags)
+        if len(_pattern_cache) >= PATTERN_CACHE_SIZE:
+            _pattern_cache.popitem(last=False)
+
+    _pattern_cache[key] = compiled
+    return compiled
+
+
+# key=value lines, optionally commented out with a single '#'
+OPTION_LINE = compile_pattern(r'^\s*(#?)\s*([^\s=#]+)=(.*)$')
+
+# conditional filters such as [pi2] or [all]
+SECTION_LINE = compile_pattern(r'^\s*\[([^\]]*)\]\s*$')
+
+
+def match_option(line):
+    """ Return (commented, name, value) for an option line, None otherwise.
+
+        Lines without an '=' are rejected before running the regex.
+    """
+
+    if '=' not in line:
+        return None
+
+    match = OPTION_LINE.match(line)
+    if not match:
+        return None
+
+    return match.group(1) == '#', match.group(2), match.group(3)
+
+
+def match_section(line):
+    """ Return the filter name of a `[section]` line, None otherwise. """
+
+    if '[' not in line:
+        return None
+
+    match = SECTION_LINE.match(line)
+    if not match:
+        return None
+
+    return match.group(1).strip()
+
+
+def replace_lines(lines, pattern, replacement):
+    """ Substitute `pattern` in every line in a single pass.
+
+        Returns the new lines and the number of substitutions made, so the
+        caller can tell whether the pattern occurred at all without a
+        separate search.
+    """
+
+    regex = compile_pattern(pattern)
+
+    new_lines = []
+    count = 0
+    for line in lines:
+        new_line, n = regex.subn(replacement, line)
+        new_lines.append(new_line)
+        count += n
+
+    return new_lines, count
@@ -8,7 +8,7 @@
 
 import os
 import sys
-from gi.repository import Gtk
+from gi.repository import Gtk, GObject
 
 from kano.network import is_internet
 from kano.gtk3.apply_styles import apply_styling_to_screen, \
@@ -25,6 +25,9 @@ from kano_settings.system.audio import is_HDMI
 from kano_settings.config_file import get_setting
 from kano_settings.system.display import get_status
 from kano_settings.get_window import get_window_class
+from kano_settings.screens import SCREENS
+from kano_settings.watcher import start_watching, stop_watching, \
+    SETTINGS_CHANGED
 
 
 def generate_main_window(plug, socket_id, screen_id, screen_name,
@@ -77,11 +80,26 @@ def get_main_window(base_class):
             self._onescreen = onescreen
 
             self.connect("delete-event", Gtk.main_quit)
+
+            # Keep the home screen tiles up to date when settings change
+            start_watching(GObject.idle_add).subscribe(
+                SETTINGS_CHANGED, self._on_settings_changed)
             # In case we are called from kano-world-launcher, terminate splash
             os.system('kano-stop-splash')
             # Init to Home Screen
             HomeScreen(self, screen_number=screen_number, screen_name=screen_name)
 
+        def _on_settings_changed(self, event):
+            # Called from the watcher thread
+            GObject.idle_add(self._refresh_menu_buttons, event.changed_keys)
+
+        def _refresh_menu_buttons(self, changed_keys):
+            for screen in SCREENS.get_screens_for_settings(changed_keys):
+                if screen.menu_button:
+                    screen.refresh_menu_button()
+
+            return False
+
         def clear_win(self):
             self.remove_main_widget()
 
@@ -147,6 +165,7 @@ def get_main_window(base_class):
 
             self._trigger_tracking_event()
 
+            stop_watching()
             Gtk.main_quit()
 
     return MainWindow
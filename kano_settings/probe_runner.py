@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# probe_runner.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Runs independent hardware probes side by side, so the slowest one rather
+# than their sum decides how long they take.
+#
+
+import time
+import threading
+
+from kano.logging import logger
+from kano_settings.profiler import span
+
+
+DEFAULT_TIMEOUT = 10
+
+
+class Probe(object):
+    """ A named function to call, and how long it may take.
+
+        `default` is the result if it fails or times out.
+    """
+
+    def __init__(self, name, func, timeout=DEFAULT_TIMEOUT, default=None):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.default = default
+        self.result = default
+
+    def run(self):
+        with span('probe.' + self.name):
+            try:
+                self.result = self.func()
+            except Exception as e:
+                logger.error('Probe {} failed: {}'.format(self.name, e))
+
+
+def run_probes(probes):
+    """ Run every probe in its own thread and wait for all of them.
+
+        Returns a dict of the results by name. The results don't depend on
+        the order in which the probes finish. A probe still running after
+        its timeout is abandoned and gives its default; its thread is a
+        daemon so it can't keep the process alive.
+    """
+
+    start = time.time()
+    threads = []
+    for probe in probes:
+        thread = threading.Thread(target=probe.run, name=probe.name)
+        thread.daemon = True
+        thread.start()
+        threads.append((probe, thread))
+
+    results = dict()
+    for probe, thread in threads:
+        thread.join(max(0, start + probe.timeout - time.time()))
+        if thread.is_alive():
+            logger.error('Probe {} timed out after {}s'.format(
+                probe.name, probe.timeout))
+            results[probe.name] = probe.default
+        else:
+            results[probe.name] = probe.result
+
+    return results
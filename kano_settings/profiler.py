@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+# profiler.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Lightweight timing of named spans, used to see where kano-settings-onboot
+# spends its time during boot.
+#
+# Spans are only recorded once the profiler is enabled, so library code can
+# be instrumented without slowing down the GUI.
+#
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Profiler(object):
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self._origin = time.time()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+        self.spans = []
+        self._origin = time.time()
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            end = time.time()
+            with self._lock:
+                self.spans.append((
+                    name,
+                    start - self._origin,
+                    end - start,
+                    threading.current_thread().name
+                ))
+
+    def summary(self):
+        """ A line per span, in the order they started """
+
+        lines = []
+        total = 0
+        for name, start, duration, thread in sorted(self.spans,
+                                                    key=lambda s: s[1]):
+            lines.append('{:>9.1f} ms  {:>9.1f} ms  {} [{}]'.format(
+                start * 1000, duration * 1000, name, thread))
+            total = max(total, start + duration)
+
+        lines.append('{:>9.1f} ms total'.format(total * 1000))
+        return '\n'.join(lines)
+
+    def save(self, path):
+        """ Write the spans as compact JSON, times in microseconds """
+
+        trace = {
+            'origin': self._origin,
+            'spans': [
+                [name, int(start * 1e6), int(duration * 1e6), thread]
+                for name, start, duration, thread in self.spans
+            ]
+        }
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(path, 'w') as trace_file:
+            json.dump(trace, trace_file, separators=(',', ':'))
+
+
+def to_chrome_trace(trace, pid=1):
+    """ Convert a saved trace to the Chrome trace event format.
+
+        The result can be loaded in chrome://tracing to compare boots.
+    """
+
+    threads = {}
+    events = []
+    for name, start, duration, thread in trace['spans']:
+        tid = threads.setdefault(thread, len(threads) + 1)
+        events.append({
+            'name': name,
+            'ph': 'X',
+            'ts': start,
+            'dur': duration,
+            'pid': pid,
+            'tid': tid
+        })
+
+    for thread, tid in threads.iteritems():
+        events.append({
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': pid,
+            'tid': tid,
+            'args': {'name': thread}
+        })
+
+    return {'traceEvents': events}
+
+
+def load_trace(path):
+    with open(path) as trace_file:
+        return json.load(trace_file)
+
+
+def export_chrome_trace(trace_path, chrome_path):
+    with open(chrome_path, 'w') as chrome_file:
+        json.dump(to_chrome_trace(load_trace(trace_path)), chrome_file)
+
+
+profiler = Profiler()
+span = profiler.span
@@ -53,6 +53,9 @@ class Screen(object):
         button.button.state = self.screen_no
         button.button.connect('clicked', cb, self.name)
 
+    def uses_setting(self, variable):
+        return self._setting_param == variable
+
     def refresh_menu_button(self):
         description = ''
 
@@ -87,6 +90,10 @@ class ScreenCollection(OrderedDict):
             if screen.screen_no == number:
                 return screen
 
+    def get_screens_for_settings(self, variables):
+        return [screen for screen in self.itervalues()
+                if any(screen.uses_setting(v) for v in variables)]
+
     def get_screens_on_home(self):
         displayed_screens = []
 
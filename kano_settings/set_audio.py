@@ -6,12 +6,15 @@
 # License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
 #
 
-from gi.repository import Gtk, Gdk
+from gi.repository import Gtk, Gdk, GObject
 import kano_settings.common as common
 from kano_settings.templates import Template
 from kano.logging import logger
+from kano.gtk3.kano_dialog import KanoDialog
 from kano_settings.config_file import get_setting
-from kano_settings.system.audio import set_to_HDMI, is_HDMI, hdmi_supported
+from kano_settings.system.audio import route_audio_async, \
+    save_audio_config, is_HDMI, is_hdmi_audio_supported, \
+    reconcile_audio_setting
 
 
 class SetAudio(Template):
@@ -70,18 +73,53 @@ class SetAudio(Template):
                 self.win.go_to_home()
                 return
 
-            set_to_HDMI(self.HDMI)
+            hdmi = self.HDMI and is_hdmi_audio_supported()
+
+            # The files are written here, on the GUI thread which also
+            # reads them
+            try:
+                save_audio_config(hdmi)
+            except (IOError, OSError) as e:
+                logger.error("set_audio / apply_changes: {}".format(e))
+                self.show_error("The audio setting could not be saved: {}"
+                                .format(e))
+                return
+
+            # amixer and alsactl can be slow, don't hold up the window
+            def done(success):
+                # The callback runs a GUI task, so wrap it!
+                GObject.idle_add(self.work_finished_cb, success)
+
+            route_audio_async(hdmi, done)
 
             # Tell user to reboot to see changes
             common.need_reboot = True
             self.win.go_to_home()
 
+    def work_finished_cb(self, success):
+        if not success:
+            logger.error("set_audio / work_finished_cb: switching the audio output failed")
+            self.show_error("The audio output could not be switched, it "
+                            "will change after a reboot.")
+
+        return False
+
+    def show_error(self, message):
+        kdialog = KanoDialog(
+            title_text="Audio",
+            description_text=message,
+            parent_window=self.win
+        )
+        kdialog.run()
+
     def current_setting(self):
-        if not hdmi_supported:
+        if not is_hdmi_audio_supported():
             self.hdmi_button.set_active(False)
             self.hdmi_button.set_sensitive(False)
             self.analog_button.set_active(True)
         else:
+            # apply_changes compares against the saved setting
+            reconcile_audio_setting()
             hdmi = is_HDMI()
             self.hdmi_button.set_active(hdmi)
             self.analog_button.set_active(not hdmi)
@@ -15,8 +15,8 @@ from kano_profile.tracker import track_data
 
 import kano_settings.common as common
 from kano_settings.boot_config import set_config_comment, get_config_value
-from kano_settings.system.display import get_model, get_status, list_supported_modes, set_hdmi_mode, read_hdmi_mode, \
-    find_matching_mode, get_overscan_status, write_overscan_values, set_overscan_status, launch_pipe, set_flip
+from kano_settings.system.display import get_model, get_status, get_mode_catalog, set_hdmi_mode, read_hdmi_mode, \
+    get_overscan_status, write_overscan_values, set_overscan_status, launch_pipe, set_flip
 
 
 class SetDisplay(Template):
@@ -56,7 +56,8 @@ class SetDisplay(Template):
         self.mode_combo.connect("changed", self.on_mode_changed)
 
         # Fill list of modes
-        modes = list_supported_modes()
+        catalog = get_mode_catalog()
+        modes = catalog.as_list()
         self.mode_combo.append("auto")
         if modes:
             for v in modes:
@@ -67,7 +68,7 @@ class SetDisplay(Template):
 
         # Select the current setting in the dropdown list
         saved_group, saved_mode = read_hdmi_mode()
-        active_item = find_matching_mode(modes, saved_group, saved_mode)
+        active_item = catalog.find(saved_group, saved_mode)
         self.mode_combo.set_selected_item_index(active_item)
         self.init_item = active_item
         self.mode_index = active_item
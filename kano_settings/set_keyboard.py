@@ -13,7 +13,7 @@ import kano_settings.system.keyboard_layouts as keyboard_layouts
 import kano_settings.system.keyboard_config as keyboard_config
 import kano_settings.common as common
 from kano_settings.templates import Template
-from kano_settings.config_file import get_setting, set_setting
+from kano_settings.config_file import get_setting, set_settings
 from kano.gtk3.buttons import OrangeButton
 from kano.gtk3.kano_combobox import KanoComboBox
 from kano.utils import detect_kano_keyboard
@@ -221,12 +221,14 @@ class SetKeyboard(Template):
         ))
 
         # Add new configurations to config file.
-        set_setting("Keyboard-continent-index", self.selected_continent_index)
-        set_setting("Keyboard-country-index", self.selected_country_index)
-        set_setting("Keyboard-variant-index", self.selected_variant_index)
-        set_setting("Keyboard-continent-human", self.selected_continent_hr)
-        set_setting("Keyboard-country-human", self.selected_country_hr)
-        set_setting("Keyboard-variant-human", self.selected_variant_hr)
+        set_settings({
+            "Keyboard-continent-index": self.selected_continent_index,
+            "Keyboard-country-index": self.selected_country_index,
+            "Keyboard-variant-index": self.selected_variant_index,
+            "Keyboard-continent-human": self.selected_continent_hr,
+            "Keyboard-country-human": self.selected_country_hr,
+            "Keyboard-variant-human": self.selected_variant_hr
+        })
 
     # setting = "variant", "continent" or "country"
     def set_defaults(self, setting):
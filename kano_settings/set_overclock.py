@@ -9,9 +9,9 @@
 from gi.repository import Gdk
 from kano_settings.templates import RadioButtonTemplate
 import kano_settings.common as common
-from kano_settings.boot_config import get_config_value
-from kano_settings.system.overclock import CLOCK_MODES, change_overclock_value, is_dangerous_overclock_value
-from kano.utils import is_model_2_b
+from kano_settings.system.overclock import CLOCK_MODES, change_overclock_value, is_dangerous_overclock_value, \
+    get_overclock_values, detect_board
+from kano_settings.system.overclock_bench import recommend_mode
 from kano.gtk3.kano_dialog import KanoDialog
 
 
@@ -21,18 +21,23 @@ class SetOverclock(RadioButtonTemplate):
     boot_config_file = "/boot/config.txt"
 
     def __init__(self, win):
-        self.is_pi2 = is_model_2_b()
+        self.board = detect_board()
+
+        # Fastest mode that passed kano-settings-cli benchmark overclock
+        recommended = recommend_mode(self.board)
 
         options = []
-        for m in CLOCK_MODES[self.is_pi2]['modes']:
-            options.append([
-                m,
+        for m in CLOCK_MODES[self.board]['modes']:
+            description = (
                 "{arm_freq}HZ ARM, "
                 "{core_freq}HZ CORE, "
                 "{sdram_freq}MHZ SDRAM, "
                 "{over_voltage} OVERVOLT"
-                .format(**CLOCK_MODES[self.is_pi2]['values'][m])
-            ])
+                .format(**CLOCK_MODES[self.board]['values'][m])
+            )
+            if m == recommended:
+                description += " - RECOMMENDED FOR THIS PI"
+            options.append([m, description])
 
         RadioButtonTemplate.__init__(
             self,
@@ -67,10 +72,10 @@ class SetOverclock(RadioButtonTemplate):
                 self.win.go_to_home()
                 return
 
-            config = CLOCK_MODES[self.is_pi2]['modes'][self.selected_button]
+            config = CLOCK_MODES[self.board]['modes'][self.selected_button]
             change_overclock = True
 
-            if is_dangerous_overclock_value(config, self.is_pi2):
+            if is_dangerous_overclock_value(config, self.board):
 
                 kdialog = KanoDialog(
                     title_text="Warning",
@@ -96,7 +101,7 @@ class SetOverclock(RadioButtonTemplate):
                 change_overclock = kdialog.run()
 
             if change_overclock:
-                change_overclock_value(config, self.is_pi2)
+                change_overclock_value(config, self.board)
 
                 # Tell user to reboot to see changes
                 common.need_reboot = True
@@ -106,11 +111,11 @@ class SetOverclock(RadioButtonTemplate):
     def current_setting(self):
         # The initial button defaults to zero (above) if the user has
         # selected a different frequency
-        freq = get_config_value('arm_freq')
+        freq = get_overclock_values(self.board)['arm_freq']
 
-        for x in CLOCK_MODES[self.is_pi2]['modes']:
-            if CLOCK_MODES[self.is_pi2]['values'][x]['arm_freq'] == freq:
-                self.initial_button = CLOCK_MODES[self.is_pi2]['modes'].index(x)
+        for x in CLOCK_MODES[self.board]['modes']:
+            if CLOCK_MODES[self.board]['values'][x]['arm_freq'] == freq:
+                self.initial_button = CLOCK_MODES[self.board]['modes'].index(x)
 
     def on_button_toggled(self, button, selected):
         if button.get_active():
@@ -10,14 +10,14 @@ import os
 from gi.repository import Gtk, GdkPixbuf, Gdk
 from kano_settings.config_file import set_setting, get_setting
 from kano_profile.badges import calculate_badges
-from kano_settings.config_file import username
+from kano.utils import get_user_unsudoed
 from kano_settings.system.wallpaper import change_wallpaper
 from kano_settings.image_table import ImageTable
 from kano_settings.templates import TwoButtonTemplate
 from kano_content.api import ContentManager
 
 wallpaper_path = "/usr/share/kano-desktop/wallpapers/"
-kano_draw_path = os.path.join('/home', username, 'Draw-content/wallpapers/')
+kano_draw_path = os.path.join('/home', get_user_unsudoed(), 'Draw-content/wallpapers/')
 padlock_path = "/usr/share/kano-settings/media/Icons/padlock.png"  # needs to be 95x95
 name_pattern = "-4-3.png"
 
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+# settings_document.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Applies a JSON document of settings and config.txt options in one go,
+# as used by kano-settings-cli apply for provisioning.
+#
+
+import re
+
+from kano_settings.config_file import settings_store
+from kano_settings.settings_schema import SCHEMA
+from kano_settings.boot_config import real_config
+
+
+# Anything else could break the line up or turn it into a comment
+CONFIG_NAME = re.compile(r'^[^\s=#]+$')
+
+
+def _is_ascii(text):
+    try:
+        text.encode('ascii')
+    except UnicodeError:
+        return False
+    return True
+
+
+def config_option_error(name, value):
+    """ Why an option can't be written to config.txt, None if it can """
+
+    if not CONFIG_NAME.match(name) or not _is_ascii(name):
+        return 'invalid option name'
+    if value is None:
+        return None
+    if isinstance(value, bool) or \
+            not isinstance(value, (int, long, float, basestring)):
+        return 'the value must be a number, a string or null'
+    if isinstance(value, basestring):
+        if '\n' in value or '\r' in value:
+            return 'the value must fit on one line'
+        if not _is_ascii(value):
+            return 'the value must be plain ASCII'
+    return None
+
+
+def check_boot_config(boot_config):
+    """ The options which can't be written, with the reason for each """
+
+    rejected = {}
+    for name, value in boot_config.iteritems():
+        if isinstance(value, dict):
+            if not CONFIG_NAME.match(name) or not _is_ascii(name):
+                rejected[name] = 'invalid section name'
+                continue
+            for option, section_value in value.iteritems():
+                error = config_option_error(option, section_value)
+                if error:
+                    rejected.setdefault(name, {})[option] = error
+        else:
+            error = config_option_error(name, value)
+            if error:
+                rejected[name] = error
+
+    return rejected
+
+
+def new_report():
+    return {
+        'settings': {'applied': {}, 'rejected': {}},
+        'boot_config': {'applied': {}, 'rejected': {}},
+        'success': False
+    }
+
+
+def apply_document(document, config=real_config, store=settings_store):
+    """ Apply a JSON document of settings and config.txt options at once.
+
+        {
+            "settings": {"Audio": "HDMI", "Font": "Big"},
+            "boot_config": {
+                "hdmi_mode": 16,
+                "hdmi_drive": null,
+                "pi2": {"arm_freq": 1000}
+            }
+        }
+
+        A null config.txt value comments the option out, a nested object
+        holds the options for that conditional section. Settings are
+        checked against the schema and config.txt options must be numbers
+        or single line strings; nothing is written unless everything is
+        valid and can be saved.
+
+        Returns a report of what was applied and what was rejected. A
+        document of the wrong shape is described in its 'error'.
+    """
+
+    report = new_report()
+
+    if not isinstance(document, dict):
+        report['error'] = 'the document must be a JSON object'
+        return report
+
+    settings = document.get('settings', {})
+    boot_config = document.get('boot_config', {})
+
+    for key, value in [('settings', settings), ('boot_config', boot_config)]:
+        if not isinstance(value, dict):
+            report['error'] = '"{}" must be a JSON object'.format(key)
+            return report
+
+    valid_settings = {}
+    for variable, value in settings.iteritems():
+        if variable not in SCHEMA:
+            valid_settings[variable] = value
+            continue
+
+        try:
+            valid_settings[variable] = SCHEMA[variable].validate(value)
+        except ValueError as e:
+            report['settings']['rejected'][variable] = str(e)
+
+    # root has no settings file, they would be silently dropped
+    if settings and not store.is_writable():
+        for variable in settings:
+            report['settings']['rejected'].setdefault(
+                variable, 'settings are not saved for the root user')
+
+    report['boot_config']['rejected'] = check_boot_config(boot_config)
+
+    # set_values() leaves an empty or missing config.txt alone
+    if boot_config and config.document().is_empty():
+        for name in boot_config:
+            report['boot_config']['rejected'].setdefault(
+                name, '{} is missing or empty'.format(config.path))
+
+    if report['settings']['rejected'] or report['boot_config']['rejected']:
+        return report
+
+    with config.transaction(), store.batch():
+        store.set_settings(valid_settings)
+
+        flat = []
+        for name, value in boot_config.iteritems():
+            if isinstance(value, dict):
+                config.set_values(value, section=name)
+            else:
+                flat.append((name, value))
+        config.set_values(flat)
+
+    report['settings']['applied'] = valid_settings
+    report['boot_config']['applied'] = boot_config
+    report['success'] = True
+    return report
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+# settings_schema.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Declares the keys of the settings file with their types and defaults, and
+# loads the file with every value checked once, up front.
+#
+
+import json
+from collections import OrderedDict
+
+from kano.logging import logger
+
+
+BOARDS = ['pi1', 'pi2']
+
+
+class Setting(object):
+    """ One key of the settings file.
+
+        `default` is either a value shared by all boards or a dict with
+        one value per board key. `choices` restricts the accepted values.
+    """
+
+    def __init__(self, name, value_type, default, choices=None):
+        self.name = name
+        self.value_type = value_type
+        self.default = default
+        self.choices = choices
+
+    def get_default(self, board):
+        if isinstance(self.default, dict):
+            return self.default[board]
+        return self.default
+
+    def validate(self, value):
+        """ Return the value converted to the declared type.
+
+            Raises ValueError if it cannot be converted or is not one of
+            the allowed choices.
+        """
+
+        if self.value_type is bool:
+            if not isinstance(value, bool):
+                raise ValueError('{} must be a boolean'.format(self.name))
+        elif self.value_type is basestring:
+            if not isinstance(value, basestring):
+                raise ValueError('{} must be a string'.format(self.name))
+        elif isinstance(value, bool) or \
+                not isinstance(value, (int, long, float)):
+            raise ValueError('{} must be a number'.format(self.name))
+        else:
+            value = self.value_type(value)
+
+        if self.choices is not None and value not in self.choices:
+            raise ValueError('{} must be one of {}'.format(
+                self.name, ', '.join(self.choices)))
+
+        return value
+
+
+SCHEMA = OrderedDict((setting.name, setting) for setting in [
+    Setting('Keyboard-continent-index', int, 1),
+    Setting('Keyboard-country-index', int, 21),
+    Setting('Keyboard-variant-index', int, 0),
+    Setting('Keyboard-continent-human', basestring, 'america'),
+    Setting('Keyboard-country-human', basestring, 'United States'),
+    Setting('Keyboard-variant-human', basestring, 'Generic'),
+    Setting('Audio', basestring, 'Analogue', choices=['Analogue', 'HDMI']),
+    Setting('Wifi', basestring, ''),
+    Setting('Wifi-connection-attempted', bool, False),
+    Setting('Overclocking', basestring, {'pi1': 'High', 'pi2': 'Standard'}),
+    Setting('CPU-governor', basestring, 'ondemand',
+            choices=['ondemand', 'performance', 'powersave']),
+    Setting('Mouse', basestring, 'Normal', choices=['Slow', 'Normal', 'Fast']),
+    Setting('Font', basestring, 'Normal', choices=['Small', 'Normal', 'Big']),
+    Setting('Wallpaper', basestring, 'kanux-background'),
+    Setting('Parental-level', float, 0),
+    Setting('Locale', basestring, 'en_US'),
+])
+
+
+def get_defaults(board):
+    return dict(
+        (name, setting.get_default(board))
+        for name, setting in SCHEMA.iteritems()
+    )
+
+
+def validate_settings(data):
+    """ Check every known key of freshly loaded settings in one go.
+
+        Invalid values are dropped, so lookups fall back to the default.
+        Keys without a schema entry are passed through untouched.
+    """
+
+    settings = dict()
+    if not isinstance(data, dict):
+        return settings
+
+    for name, value in data.iteritems():
+        setting = SCHEMA.get(name)
+        if setting is None:
+            settings[name] = value
+            continue
+
+        try:
+            settings[name] = setting.validate(value)
+        except ValueError as e:
+            logger.warn('Ignoring invalid setting: {}'.format(e))
+
+    return settings
+
+
+def decode_settings(text):
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return dict()
+
+    return validate_settings(data)
+
+
+def encode_settings(data, compact=True):
+    """ Serialise the settings, without any whitespace when `compact`.
+
+        The file stays JSON so that other Kano tools can still read it.
+    """
+
+    if compact:
+        return json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return json.dumps(data, sort_keys=True, indent=2)
+
+
+def load_settings(path):
+    """ Read a settings file into a dict of typed values.
+
+        Missing or unreadable files give an empty dict.
+    """
+
+    try:
+        with open(path) as settings_file:
+            return decode_settings(settings_file.read())
+    except IOError:
+        return dict()
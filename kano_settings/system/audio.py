@@ -7,9 +7,12 @@
 #
 # Contains the audio backend functions
 
+import re
+import time
+import threading
 
 from kano_settings.config_file import get_setting, set_setting, file_replace
-from kano_settings.boot_config import set_config_value
+from kano_settings.boot_config import set_config_values
 from kano.utils import run_cmd
 from kano.logging import logger
 
@@ -18,69 +21,188 @@ amixer_control = "name='PCM Playback Route'"
 
 analogue_value = 1
 hdmi_value = 2
-hdmi_string = ": values={}".format(hdmi_value)
+route_value = re.compile(r': values=([0-9]+)')
 
-store_cmd = "service alsa-utils restart"
+# How long a read of the mixer is trusted for, in seconds
+MIXER_STATE_TTL = 2
+
+store_cmd = "alsactl store 0"
 amixer_set_cmd = "amixer -c 0 cset {control} {{value}}".format(
     control=amixer_control)
 amixer_get_cmd = "amixer -c 0 cget {control}".format(control=amixer_control)
 
-try:
-    from kano_settings.system.display import get_edid
-    hdmi_supported = get_edid()['hdmi_audio']
-except Exception:
-    hdmi_supported = False
+_hdmi_supported = None
 
 
-# set_to_HDMI = True or False
-def set_to_HDMI(HDMI):
-    if not hdmi_supported:
-        HDMI = False
+def is_hdmi_audio_supported():
+    """ Can the connected display play audio over HDMI?
+
+        Reading the EDID is slow, so it is only done the first time the
+        answer is needed rather than whenever this module is imported.
+    """
+
+    global _hdmi_supported
+
+    if _hdmi_supported is None:
+        try:
+            from kano_settings.system.display import get_edid
+            _hdmi_supported = get_edid()['hdmi_audio']
+        except Exception:
+            _hdmi_supported = False
+
+    return _hdmi_supported
+
+
+def audio_config_values(HDMI):
+    """ The config.txt options for routing the sound to HDMI or not """
+
+    if HDMI:
+        return [('hdmi_ignore_edid_audio', None), ('hdmi_drive', 2)]
+    return [('hdmi_ignore_edid_audio', 1), ('hdmi_drive', None)]
+
+
+def store_mixer_state():
+    """ Save the mixer state to /var/lib/alsa/asound.state.
+
+        This is all 'service alsa-utils restart' did for us, without
+        reloading every sound card.
+    """
+
+    o, e, rc = run_cmd(store_cmd)
+    if rc:
+        logger.warn("error from alsactl: {} {} {}".format(o, e, rc))
+    return rc == 0
+
+
+def route_audio(HDMI):
+    """ Switch the mixer and store its state.
+
+        Only ALSA is touched, no kano-settings files. Returns False if
+        amixer failed to switch the route.
+    """
 
     # 1 analog
     # 2 hdmi
-
-    # These are the changes we'll apply if they have changed from what they were
     if HDMI:
         amixer_cmd = amixer_set_cmd.format(value=hdmi_value)
-        set_config_value("hdmi_ignore_edid_audio", None)
-        set_config_value("hdmi_drive", 2)
-        config = "HDMI"
     else:
         amixer_cmd = amixer_set_cmd.format(value=analogue_value)
-        set_config_value("hdmi_ignore_edid_audio", 1)
-        set_config_value("hdmi_drive", None)
-        config = "Analogue"
 
     # Set audio path in amixer
     o, e, rc = run_cmd(amixer_cmd)
     if rc:
         logger.warn("error from amixer: {} {} {}".format(o, e, rc))
+        mixer_state.invalidate()
+    else:
+        mixer_state.update(hdmi_value if HDMI else analogue_value)
+
+    store_mixer_state()
+    return rc == 0
 
-    # trigger alsa-utils to store the path in /var/lib/alsa/asound.state
-    o, e, rc = run_cmd(store_cmd)
-    if rc:
-        logger.warn("error from alsa-utils: {} {} {}".format(o, e, rc))
 
-    set_setting('Audio', config)
+def save_audio_config(HDMI):
+    """ Keep the choice for the next boot, with one write of config.txt and
+        one of the settings.
+    """
+
+    set_config_values(audio_config_values(HDMI))
+    set_setting('Audio', 'HDMI' if HDMI else 'Analogue')
+
+
+# set_to_HDMI = True or False
+def set_to_HDMI(HDMI):
+    """ Route the sound and keep the choice for the next boot.
+
+        Returns False if amixer failed to switch the route.
+    """
+
+    if HDMI and not is_hdmi_audio_supported():
+        HDMI = False
+
+    success = route_audio(HDMI)
+    save_audio_config(HDMI)
+    return success
+
+
+def route_audio_async(HDMI, callback=None):
+    """ Run route_audio on a background thread and return the thread.
+
+        The config.txt and settings caches are not thread safe, so the
+        caller saves the choice on its own thread with save_audio_config().
+        `callback(success)` runs on the worker thread; GUI code must hand
+        it over to the main loop, e.g. with GObject.idle_add.
+    """
+
+    def switch():
+        success = False
+        try:
+            success = route_audio(HDMI)
+        except Exception as e:
+            logger.error('Error switching audio output: {}'.format(e))
+
+        if callback:
+            callback(success)
+
+    # Not a daemon, so quitting waits for the mixer state to be stored
+    thread = threading.Thread(target=switch)
+    thread.start()
+    return thread
+
+
+def parse_route(amixer_output):
+    """ The route value from the output of amixer cget, None if missing """
+
+    match = route_value.search(amixer_output or '')
+    if not match:
+        return None
+    return int(match.group(1))
+
+
+class MixerState(object):
+    """ The PCM route, read from ALSA at most once every `ttl` seconds.
+
+        set_to_HDMI() updates it directly, so only changes made outside
+        kano-settings wait for the TTL to be noticed.
+    """
+
+    def __init__(self, ttl=MIXER_STATE_TTL):
+        self.ttl = ttl
+        self._route = None
+        self._read_time = None
+
+    def read(self):
+        amixer_string, e, rc = run_cmd(amixer_get_cmd)
+        if rc:
+            logger.warn("error from amixer: {} {} {}".format(amixer_string, e, rc))
+        return parse_route(amixer_string)
+
+    def route(self):
+        now = time.time()
+        if self._read_time is None or now - self._read_time > self.ttl:
+            self._route = self.read()
+            self._read_time = now
+        return self._route
+
+    def update(self, route):
+        self._route = route
+        self._read_time = time.time()
+
+    def invalidate(self):
+        self._read_time = None
+
+
+mixer_state = MixerState()
 
 
 # Returns is_HDMI = True or False
 def is_HDMI():
-    # Find the audio setting
-    amixer_string, e, rc = run_cmd(amixer_get_cmd)
-    if rc:
-        logger.warn("error from amixer: {} {} {}".format(amixer_string, e, rc))
+    """ Only reads the mixer, see reconcile_audio_setting for the settings """
+    return mixer_state.route() == hdmi_value
 
-    if amixer_string.find(hdmi_string) != -1:
-        # Make sure config file is up to date
-        if get_setting('Audio') != 'HDMI':
-            set_setting('Audio', "HDMI")
-        return True
 
-    # Default to Analogue
-    else:
-        # Make sure config file is up to date
-        if get_setting('Audio') != 'Analogue':
-            set_setting('Audio', "Analogue")
-        return False
+def reconcile_audio_setting():
+    """ Make the Audio setting match the mixer, writing only if it drifted """
+
+    config = 'HDMI' if is_HDMI() else 'Analogue'
+    if get_setting('Audio') != config:
+        set_setting('Audio', config)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+# board.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Identifies the Raspberry Pi board from its revision code
+#
+
+cpuinfo_path = '/proc/cpuinfo'
+
+# Set when the board has been overvolted; not part of the model
+WARRANTY_BITS = 0x3000000
+
+_board_revision = None
+
+
+def normalise_revision(code):
+    """ Lower case hex revision code without the warranty bits, e.g. the
+        '1000002' of an overvolted early Model B becomes '0002'.
+    """
+
+    try:
+        value = int(code, 16) & ~WARRANTY_BITS
+    except (TypeError, ValueError):
+        return None
+
+    # New style codes have bit 23 set and are six digits long
+    if value & 0x800000:
+        return '{:06x}'.format(value)
+    return '{:04x}'.format(value)
+
+
+def read_board_revision(path=cpuinfo_path):
+    """ The board's revision code, read without forking """
+
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith('Revision'):
+                    return normalise_revision(line.split(':', 1)[1].strip())
+    except IOError:
+        pass
+
+    return None
+
+
+def get_board_revision():
+    """ read_board_revision(), cached as the board can't change under us """
+
+    global _board_revision
+
+    if _board_revision is None:
+        _board_revision = read_board_revision()
+
+    return _board_revision
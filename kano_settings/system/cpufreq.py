@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+# cpufreq.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Live CPU performance control through the kernel's cpufreq governors.
+#
+# Unlike the overclock modes in config.txt, a governor takes effect
+# immediately and can be switched back just as fast. The choice is saved in
+# the settings and applied again on boot by /etc/rc.overclock.
+#
+
+import os
+import re
+
+from kano.logging import logger
+from kano_settings.config_file import set_setting, settings_file, \
+    settings_store
+from kano_settings.settings_schema import SCHEMA, load_settings
+
+
+cpu_dir = '/sys/devices/system/cpu'
+
+GOVERNOR_SETTING = 'CPU-governor'
+GOVERNORS = ['ondemand', 'performance', 'powersave']
+
+# How busy a core has to be, in percent, before ondemand speeds it up
+ONDEMAND_UP_THRESHOLD = 70
+
+CPU_NAME = re.compile(r'^cpu[0-9]+$')
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except IOError:
+        return None
+
+
+def _write(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+
+def list_cpufreq_dirs(base=cpu_dir):
+    """ The cpufreq directory of every core which has one """
+
+    try:
+        names = os.listdir(base)
+    except OSError:
+        return []
+
+    return [
+        os.path.join(base, name, 'cpufreq')
+        for name in sorted(names)
+        if CPU_NAME.match(name) and
+        os.path.isdir(os.path.join(base, name, 'cpufreq'))
+    ]
+
+
+def get_governor(base=cpu_dir):
+    dirs = list_cpufreq_dirs(base)
+    if not dirs:
+        return None
+    return _read(os.path.join(dirs[0], 'scaling_governor'))
+
+
+def get_available_governors(base=cpu_dir):
+    dirs = list_cpufreq_dirs(base)
+    if not dirs:
+        return []
+
+    available = _read(os.path.join(dirs[0], 'scaling_available_governors'))
+    return [g for g in GOVERNORS if g in (available or '').split()]
+
+
+def apply_governor(governor, base=cpu_dir):
+    """ Switch every core to `governor` right away.
+
+        The frequency limits are set to the whole hardware range, except
+        for powersave which is pinned to the lowest frequency.
+        Returns False if the governor can't be used on this kernel.
+    """
+
+    if governor not in GOVERNORS:
+        logger.error('Unknown cpufreq governor {}'.format(governor))
+        return False
+
+    dirs = list_cpufreq_dirs(base)
+    if not dirs or governor not in get_available_governors(base):
+        logger.warn('cpufreq governor {} is not available'.format(governor))
+        return False
+
+    try:
+        for cpufreq in dirs:
+            min_freq = _read(os.path.join(cpufreq, 'cpuinfo_min_freq'))
+            max_freq = _read(os.path.join(cpufreq, 'cpuinfo_max_freq'))
+            if governor == 'powersave':
+                max_freq = min_freq
+
+            _write(os.path.join(cpufreq, 'scaling_governor'), governor)
+
+            # Raise the maximum first so min never ends up above max
+            if max_freq:
+                _write(os.path.join(cpufreq, 'scaling_max_freq'), max_freq)
+            if min_freq:
+                _write(os.path.join(cpufreq, 'scaling_min_freq'), min_freq)
+
+        if governor == 'ondemand':
+            threshold = os.path.join(base, 'cpufreq', 'ondemand',
+                                     'up_threshold')
+            if os.path.exists(threshold):
+                _write(threshold, ONDEMAND_UP_THRESHOLD)
+    except IOError as e:
+        logger.error('Could not set cpufreq governor {}: {}'.format(
+            governor, e))
+        return False
+
+    return True
+
+
+def save_governor(governor):
+    """ Keep the governor for the next boot.
+
+        Returns False if it can't be saved, which is the case when running
+        as root rather than through sudo.
+    """
+
+    if not settings_store.is_writable():
+        logger.error('Settings are not saved for {}, cpufreq governor {} '
+                     'will not be restored on boot'.format(
+                         settings_store.username(), governor))
+        return False
+
+    set_setting(GOVERNOR_SETTING, governor)
+    return True
+
+
+def get_saved_governor(path=settings_file):
+    # Read the file directly, as this runs as root during boot
+    governor = load_settings(path).get(GOVERNOR_SETTING)
+    if governor not in GOVERNORS:
+        governor = SCHEMA[GOVERNOR_SETTING].default
+    return governor
+
+
+def apply_saved_governor(base=cpu_dir, path=settings_file):
+    """ Called on boot to restore the governor the user chose.
+
+        Falls back to ondemand, returns False if no governor could be set.
+    """
+
+    governor = get_saved_governor(path)
+    if apply_governor(governor, base):
+        return True
+    if governor != 'ondemand':
+        return apply_governor('ondemand', base)
+    return False
@@ -9,33 +9,205 @@
 #
 
 import os
-import re
+import glob
+import json
+import hashlib
+import tempfile
 import subprocess
 import time
-from kano_settings.boot_config import set_config_value, get_config_value
+import threading
+from kano_settings.boot_config import set_config_value, set_config_values, \
+    get_config_value, transaction
 from kano.utils import run_cmd, delete_file
 from kano.logging import logger
+from kano_settings.line_matcher import compile_pattern
+from kano_settings.system.edid import decode_edid, read_edid_id
+from kano_settings.system.display_rules import mode_config_values
+from kano_settings.profiler import span
 
 tvservice_path = '/usr/bin/tvservice'
 fbset_path = '/bin/fbset'
 xrefresh_path = '/usr/bin/xrefresh'
 
+# The catalog is keyed by the boot id and the EDID, so it is rebuilt at most
+# once per boot, or when a different display is plugged in. It is kept out
+# of /tmp, where other users could plant a symlink for us to write through.
+mode_catalog_path = '/var/cache/kano-settings/display-modes.json'
+boot_id_path = '/proc/sys/kernel/random/boot_id'
 
-def switch_display_safe_mode():
+# Kernels with a DRM driver expose the display's EDID directly
+drm_edid_glob = '/sys/class/drm/card*-HDMI-A-*/edid'
+
+MODE_GROUPS = ['CEA', 'DMT']
+
+# Polling of tvservice after a live mode switch, in seconds
+MODE_SWITCH_TIMEOUT = 5
+MODE_POLL_INITIAL = 0.05
+MODE_POLL_MAX = 0.8
+
+_mode_catalog = None
+
+
+class DisplayProbe(object):
+    """ Asks the display tools about the connected screen at most once.
+
+        Every consumer in the process shares the results, so autoconfig at
+        boot costs one call of each tool instead of one per question.
+        invalidate() forgets results that are known to have changed, e.g.
+        the status after a mode switch.
+    """
+
+    def __init__(self):
+        self._results = {}
+
+    def _memoize(self, name, func):
+        if name not in self._results:
+            self._results[name] = func()
+        return self._results[name]
+
+    def invalidate(self, *names):
+        if not names:
+            self._results.clear()
+        for name in names:
+            self._results.pop(name, None)
+
+    def edid_path(self):
+        """ A file holding the raw EDID, None if there is no display """
+        return self._memoize('edid_path', self._find_edid_path)
+
+    def _find_edid_path(self):
+        # Fast path: the kernel already has the EDID blob. sysfs reports a
+        # size of 0 for it, so only reading tells whether a display is on
+        # the connector.
+        for path in sorted(glob.glob(drm_edid_glob)):
+            try:
+                with open(path, 'rb') as edid_file:
+                    edid_bytes = edid_file.read()
+            except IOError:
+                continue
+
+            if edid_bytes:
+                self._results['edid_bytes'] = edid_bytes
+                return path
+
+        fd, edid_dat_path = tempfile.mkstemp(prefix='kano-edid-')
+        os.close(fd)
+        _, _, rc = run_cmd('{} -d {}'.format(tvservice_path, edid_dat_path))
+        if rc != 0:
+            delete_file(edid_dat_path)
+            return None
+
+        self._results['edid_tmp_path'] = edid_dat_path
+        return edid_dat_path
+
+    def edid_bytes(self):
+        def read():
+            path = self.edid_path()
+            if not path:
+                return None
+            with open(path, 'rb') as edid_file:
+                return edid_file.read()
+        return self._memoize('edid_bytes', read)
+
+    def refresh_edid(self):
+        """ Read the EDID again, e.g. to notice another display plugged in.
+
+            Everything derived from the old EDID is forgotten if it changed.
+        """
+
+        old_bytes = self._results.get('edid_bytes')
+        self.cleanup()
+        self.invalidate('edid_path', 'edid_bytes')
+
+        edid_bytes = self.edid_bytes()
+        if edid_bytes != old_bytes:
+            self.invalidate('edid_text', 'edid', 'model', 'status_line')
+        return edid_bytes
+
+    def edid_text(self):
+        def parse():
+            path = self.edid_path()
+            if not path:
+                logger.error('error getting edid dat')
+                return None
+
+            edid_txt, _, rc = run_cmd('edidparser {}'.format(path))
+            if rc != 0:
+                logger.error('error parsing edid dat')
+                return None
+            return edid_txt.splitlines()
+        return self._memoize('edid_text', parse)
+
+    def edid(self):
+        def parse():
+            edid_bytes = self.edid_bytes()
+
+            # edidparser is only needed for modes the decoder doesn't know
+            with span('edid.parse'):
+                edid = decode_edid(edid_bytes)
+            if edid is not None:
+                self.cleanup()
+                return edid
+
+            edid_txt = self.edid_text()
+            self.cleanup()
+            if not edid_txt:
+                return None
+            with span('edid.parse_text'):
+                return parse_edid(edid_txt)
+        return self._memoize('edid', parse)
+
+    def model(self):
+        def read():
+            display_name, _, _ = run_cmd(tvservice_path + ' -n')
+            return display_name[16:].rstrip()
+        return self._memoize('model', read)
+
+    def status_line(self):
+        def read():
+            status_str, _, _ = run_cmd(tvservice_path + ' -s')
+            return status_str
+        return self._memoize('status_line', read)
+
+    def cleanup(self):
+        """ Remove the EDID dump tvservice may have written.
+
+            The raw bytes are kept, only a later edid_text() has to dump
+            the EDID again.
+        """
+
+        tmp_path = self._results.get('edid_tmp_path')
+        if not tmp_path:
+            return
+
+        self.edid_bytes()
+        delete_file(tmp_path)
+        self.invalidate('edid_tmp_path', 'edid_path')
+
+
+display_probe = DisplayProbe()
+
+
+def switch_display_safe_mode(callback=None):
     # Finds the first available display resolution that is safe
-    # and switches to this mode immediately
+    # and switches to this mode immediately.
+    # With a callback the switch runs in the background, see
+    # set_hdmi_mode_live_async
     safe_resolution = '1024x768'
 
     try:
-        modes = list_supported_modes()
-        for m in modes:
-            resolution = m.split()[1]
-            if resolution == safe_resolution:
-                group = m.split()[0].split(':')[0]
-                mode = m.split()[0].split(':')[1]
-            logger.info(
-               'Switching display to safe resolution {} (group={} mode={})'
-               .format(resolution, group, mode))
+        modes = get_mode_catalog().find_resolution(safe_resolution)
+        if not modes:
+            logger.error('No safe resolution {} available'.format(safe_resolution))
+            return
+
+        group, mode = modes[0]
+        logger.info(
+           'Switching display to safe resolution {} (group={} mode={})'
+           .format(safe_resolution, group, mode))
+        if callback:
+            set_hdmi_mode_live_async(group, mode, callback)
+        else:
             set_hdmi_mode_live(group, mode)
     except:
         logger.error('Error switching display to safe mode')
@@ -58,9 +230,9 @@ def get_supported_modes(group):
     cea_modes = subprocess.check_output(["/opt/vc/bin/tvservice", "-m", group.upper()])
     cea_modes = cea_modes.decode()
     cea_modes = cea_modes.split("\n")[1:]
-    mode_line_re = r'mode (\d+): (\d+x\d+) @ (\d+Hz) (\d+:\d+)'
+    mode_line_re = compile_pattern(r'mode (\d+): (\d+x\d+) @ (\d+Hz) (\d+:\d+)')
     for line in cea_modes:
-        mode_line_match = re.search(mode_line_re, line)
+        mode_line_match = mode_line_re.search(line)
         if mode_line_match:
             number = mode_line_match.group(1)
             res = mode_line_match.group(2)
@@ -71,24 +243,162 @@ def get_supported_modes(group):
     return modes
 
 
+class ModeCatalog(object):
+    """ The modes supported by the connected display, indexed for lookups.
+
+        `modes` maps each group, 'CEA' or 'DMT', to the {number: [res, freq,
+        aspect]} dict returned by get_supported_modes(). `key` identifies
+        the display and boot the modes were read for.
+    """
+
+    def __init__(self, modes, key=None):
+        self.key = key
+        self.modes = modes
+        self._list = []
+        self._by_mode = {}
+        self._by_resolution = {}
+
+        for group in MODE_GROUPS:
+            group_modes = modes.get(group, {})
+            for number in sorted(group_modes):
+                res, freq, aspect = group_modes[number]
+                self._list.append("{}:{:d}  {}  {}  {}".format(
+                    group.lower(), number, res, freq, aspect))
+
+                # positions are 1-based, 0 is 'auto' in the GUI
+                self._by_mode[(group, number)] = len(self._list)
+                self._by_resolution.setdefault(res, []).append(
+                    (group.lower(), number))
+
+    def as_list(self):
+        return list(self._list)
+
+    def find(self, group, mode):
+        """ Position of the mode in as_list(), counting from 1. 0 if absent """
+        return self._by_mode.get((group.upper(), int(mode)), 0)
+
+    def find_resolution(self, resolution):
+        """ All (group, mode) pairs with the given resolution, e.g. 1024x768 """
+        return list(self._by_resolution.get(resolution, []))
+
+    def to_json(self):
+        return json.dumps({'key': self.key, 'modes': self.modes})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        modes = dict(
+            (group, dict((int(n), v) for n, v in group_modes.iteritems()))
+            for group, group_modes in data['modes'].iteritems()
+        )
+        return cls(modes, data['key'])
+
+
+def get_display_key():
+    """ Changes when another display is plugged in or after a reboot """
+
+    key = hashlib.sha1()
+    try:
+        with open(boot_id_path) as boot_id:
+            key.update(boot_id.read())
+    except IOError:
+        pass
+    key.update(display_probe.refresh_edid() or '')
+    display_probe.cleanup()
+    return key.hexdigest()
+
+
+def save_mode_catalog(catalog, path=mode_catalog_path):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    fd, tmp_path = tempfile.mkstemp(prefix='.display-modes-', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as cache_file:
+            cache_file.write(catalog.to_json())
+        os.chmod(tmp_path, 0644)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        delete_file(tmp_path)
+        raise
+
+
+def get_mode_catalog(refresh=False):
+    """ The ModeCatalog of the connected display.
+
+        tvservice is only asked for the modes of each group when the display
+        key changes. Otherwise they come from memory or the cache file.
+    """
+
+    global _mode_catalog
+
+    key = get_display_key()
+    if not refresh and _mode_catalog is not None and _mode_catalog.key == key:
+        return _mode_catalog
+
+    if not refresh and os.path.exists(mode_catalog_path):
+        try:
+            with open(mode_catalog_path) as cache_file:
+                catalog = ModeCatalog.from_json(cache_file.read())
+            if catalog.key == key:
+                _mode_catalog = catalog
+                return catalog
+        except (IOError, ValueError, KeyError) as e:
+            logger.warn('Ignoring broken display mode cache: {}'.format(e))
+
+    modes = dict((group, get_supported_modes(group)) for group in MODE_GROUPS)
+    _mode_catalog = ModeCatalog(modes, key)
+
+    try:
+        save_mode_catalog(_mode_catalog)
+    except (IOError, OSError) as e:
+        logger.warn('Could not save the display mode cache: {}'.format(e))
+
+    return _mode_catalog
+
+
 def list_supported_modes():
-    cea_modes = get_supported_modes("CEA")
-    dmt_modes = get_supported_modes("DMT")
-    modes = []
+    return get_mode_catalog().as_list()
 
-    for key in sorted(cea_modes):
-        values = cea_modes[key]
-        string = "cea:{:d}  {}  {}  {}".format(key, values[0], values[1], values[2])
-        modes.append(string)
+def parse_status_mode(status_str):
+    """ The (group, mode) of a tvservice -s line, None if it has none """
 
-    for key in sorted(dmt_modes):
-        values = dmt_modes[key]
-        string = "dmt:{:d}  {}  {}  {}".format(key, values[0], values[1], values[2])
-        modes.append(string)
+    # e.g. state 0x12000a [HDMI DMT (82) RGB full 16:9], 1920x1080 @ 60.00Hz, progressive
+    match = compile_pattern(r'\b(CEA|DMT) \((\d+)\)').search(status_str or '')
+    if not match:
+        return None
+    return match.group(1), int(match.group(2))
 
-    return modes
 
-def set_hdmi_mode_live(group=None, mode=None, drive='HDMI'):
+def wait_for_mode(group, mode, timeout=MODE_SWITCH_TIMEOUT):
+    """ Poll tvservice until it reports the given mode as active.
+
+        The interval starts short and doubles, so a fast display is picked
+        up almost immediately without hammering tvservice on a slow one.
+        Returns False if the mode isn't active after `timeout` seconds.
+    """
+
+    # Callers use lowercase groups, tvservice prints e.g. 'DMT (16)'
+    expected = (group.upper(), int(mode))
+    deadline = time.time() + timeout
+    interval = MODE_POLL_INITIAL
+
+    while True:
+        status_str, _, rc = run_cmd(tvservice_path + ' -s')
+        if rc == 0 and parse_status_mode(status_str) == expected:
+            return True
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, MODE_POLL_MAX)
+
+
+def set_hdmi_mode_live(group=None, mode=None, drive='HDMI',
+                       timeout=MODE_SWITCH_TIMEOUT):
     success = False
 
     if not group or not mode:
@@ -96,31 +406,47 @@ def set_hdmi_mode_live(group=None, mode=None, drive='HDMI'):
 
     # ask tvservice to switch to the given mode immediately
     status_str, _, rc = run_cmd(tvservice_path + ' -e "{} {} {}"'.format(group, mode, drive))
+    display_probe.invalidate('status_line')
     if rc == 0 and os.path.exists(fbset_path) and os.path.exists(xrefresh_path):
         # refresh the Xserver screen because most probably it has become black as a result of the graphic mode switch.
-        # we wait a tiny bit because on some occassions it happens to early and has no effect (leaves the screen black).
-        time.sleep(2)
+        # doing it before the display has settled in the new mode has no effect (leaves the screen black).
+        if not wait_for_mode(group, mode, timeout):
+            logger.warn('Display not ready in {} {} after {}s, refreshing anyway'
+                        .format(group, mode, timeout))
         _, _, _ = run_cmd('{} -depth 8 ; {} -depth 16'.format(fbset_path, fbset_path))
         _, _, _ = run_cmd(xrefresh_path)
         success = True
 
     return success
 
-def set_hdmi_mode(group=None, mode=None):
-    if not group or not mode:
-        set_config_value("hdmi_group", None)
-        set_config_value("hdmi_mode", None)
-        return
 
-    group = group.lower()
-    mode = int(mode)
+def set_hdmi_mode_live_async(group=None, mode=None, callback=None,
+                             drive='HDMI', timeout=MODE_SWITCH_TIMEOUT):
+    """ Switch modes on a background thread and return the thread.
+
+        `callback(success)` runs on that thread once the display is ready
+        or the timeout expired; GUI code must hand it over to the main
+        loop, e.g. with GObject.idle_add.
+    """
+
+    def switch():
+        success = False
+        try:
+            success = set_hdmi_mode_live(group, mode, drive, timeout)
+        except Exception as e:
+            logger.error('Error switching display mode: {}'.format(e))
+
+        if callback:
+            callback(success)
+
+    thread = threading.Thread(target=switch)
+    thread.daemon = True
+    thread.start()
+    return thread
 
-    if group == "cea":
-        set_config_value("hdmi_group", 1)
-    else:
-        set_config_value("hdmi_group", 2)
 
-    set_config_value("hdmi_mode", mode)
+def set_hdmi_mode(group=None, mode=None):
+    set_config_values(mode_config_values(group, mode))
 
 # flip screen 180
 def set_flip(display_rotate=None):
@@ -132,24 +458,27 @@ def set_flip(display_rotate=None):
 def set_safeboot_mode():
     logger.warn("Safe boot requested")
 
-    set_config_value("hdmi_force_hotplug", 1)
-    set_config_value("config_hdmi_boost", 4)
+    with transaction():
+        set_config_values([
+            ("hdmi_force_hotplug", 1),
+            ("config_hdmi_boost", 4),
 
-    set_config_value("hdmi_group", 2)
-    set_config_value("hdmi_mode", 16)
+            ("hdmi_group", 2),
+            ("hdmi_mode", 16),
 
-    set_config_value("disable_overscan", 1)
-    set_config_value("overscan_left", 0)
-    set_config_value("overscan_right", 0)
-    set_config_value("overscan_top", 0)
-    set_config_value("overscan_bottom", 0)
+            ("disable_overscan", 1),
+            ("overscan_left", 0),
+            ("overscan_right", 0),
+            ("overscan_top", 0),
+            ("overscan_bottom", 0)
+        ])
 
 
 
 def get_status():
     status = dict()
 
-    status_str, _, _ = run_cmd(tvservice_path + ' -s')
+    status_str = display_probe.status_line()
     if 'DMT' in status_str:
         status['group'] = 'DMT'
     elif 'CEA' in status_str:
@@ -176,10 +505,14 @@ def get_status():
     return status
 
 
-def is_mode_fallback():
+def is_mode_fallback(status=None):
     """ Is this the fallback mode which we get when the cable is unplugged?
+        `status` saves asking tvservice again if get_status() was called.
     """
-    status = get_status()
+    if status is None:
+        status = get_status()
+    if not status:
+        return None
     res = status['resolution']
     parts = res.split('x')
     if len(parts) != 2:
@@ -195,10 +528,7 @@ def is_mode_fallback():
 
 
 def get_model():
-    cmd = '/opt/vc/bin/tvservice -n'
-    display_name, _, _ = run_cmd(cmd)
-    display_name = display_name[16:].rstrip()
-    return display_name
+    return display_probe.model()
 
 
 def get_overscan_status():
@@ -234,10 +564,12 @@ def set_overscan_status(overscan_values):
 
 
 def write_overscan_values(overscan_values):
-    set_config_value('overscan_top', overscan_values['top'])
-    set_config_value('overscan_bottom', overscan_values['bottom'])
-    set_config_value('overscan_left', overscan_values['left'])
-    set_config_value('overscan_right', overscan_values['right'])
+    set_config_values([
+        ('overscan_top', overscan_values['top']),
+        ('overscan_bottom', overscan_values['bottom']),
+        ('overscan_left', overscan_values['left']),
+        ('overscan_right', overscan_values['right'])
+    ])
 
 
 def is_overscan():
@@ -259,26 +591,14 @@ def read_hdmi_mode():
     return group_name, mode
 
 
-def find_matching_mode(modes, group, mode):
-    string = '{}:{}'.format(group.lower(), mode)
-    for i, m in enumerate(modes):
-        if m.startswith(string):
-            return i + 1
-
+def find_matching_mode(group, mode):
     # 0 for auto
-    return 0
+    return get_mode_catalog().find(group, mode)
 
 
 def read_edid():
-    edid_dat_path = '/tmp/edid.dat'
-
-    delete_file(edid_dat_path)
-    edid_txt, _, rc = run_cmd('tvservice -d {0} && edidparser {0}'.format(edid_dat_path))
-    edid_txt = edid_txt.splitlines()
-    if rc != 0:
-        logger.error('error getting edid dat')
-        return
-    delete_file(edid_dat_path)
+    edid_txt = display_probe.edid_text()
+    display_probe.cleanup()
     return edid_txt
 
 
@@ -362,9 +682,17 @@ def parse_edid(edid_txt):
     return edid
 
 
+def get_edid_id():
+    """ Manufacturer and product code of the display, e.g. 'GSM5B09' """
+    edid_id = read_edid_id(display_probe.edid_bytes())
+    display_probe.cleanup()
+    return edid_id
+
+
 def get_edid():
-    edid_txt = read_edid()
-    if not edid_txt:
+    edid = display_probe.edid()
+    if not edid:
         return
 
-    return parse_edid(edid_txt)
+    # callers are free to modify their copy
+    return dict(edid)
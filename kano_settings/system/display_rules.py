@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+# display_rules.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Decides how config.txt should be set up for the connected screen.
+#
+# Screens which misreport their capabilities are listed in a data file,
+# display-rules.json, which can be updated independently of the code:
+#
+#   {
+#       "models": {"<monitor name>": {<overrides>}},
+#       "products": {"<EDID manufacturer and product, e.g. GSM5B09>": {...}}
+#   }
+#
+# The overrides may set target_group, target_mode, is_monitor and
+# target_overscan.
+#
+
+import os
+import json
+from collections import OrderedDict
+
+
+rules_file = 'display-rules.json'
+rel_rules_path = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', '..', rules_file))
+abs_rules_path = os.path.join('/usr/share/kano-settings/data', rules_file)
+
+OVERRIDE_KEYS = ['target_group', 'target_mode', 'is_monitor',
+                 'target_overscan']
+
+OVERSCAN_KEYS = ['overscan_left', 'overscan_right', 'overscan_top',
+                 'overscan_bottom']
+OVERSCAN_VALUE = -48
+
+
+def get_rules_path():
+    if os.path.exists(rel_rules_path):
+        return rel_rules_path
+    return abs_rules_path
+
+
+def mode_config_values(group, mode):
+    """ The hdmi_group and hdmi_mode config.txt values for a mode """
+
+    if not group or not mode:
+        return [('hdmi_group', None), ('hdmi_mode', None)]
+
+    group_value = 1 if group.lower() == 'cea' else 2
+    return [('hdmi_group', group_value), ('hdmi_mode', int(mode))]
+
+
+class DisplayRules(object):
+    """ Per screen overrides, indexed by monitor name and by EDID id """
+
+    def __init__(self, models=None, products=None):
+        self.models = models or {}
+        self.products = products or {}
+
+    @classmethod
+    def load(cls, path=None):
+        """ Read the rules file; missing or broken files give no overrides """
+
+        try:
+            with open(path or get_rules_path()) as rules_file:
+                data = json.load(rules_file)
+        except (IOError, ValueError):
+            return cls()
+
+        if not isinstance(data, dict):
+            return cls()
+
+        return cls(data.get('models'), data.get('products'))
+
+    def find_override(self, model, edid_id=None):
+        # The monitor name is checked first as it has always been
+        override = self.models.get(model)
+        if override is None and edid_id:
+            override = self.products.get(edid_id)
+        return override
+
+    def targets(self, edid, model, edid_id=None):
+        """ The configuration the screen should end up with """
+
+        targets = dict((key, edid[key]) for key in OVERRIDE_KEYS)
+
+        override = self.find_override(model, edid_id)
+        if override:
+            targets.update((key, override[key])
+                           for key in OVERRIDE_KEYS if key in override)
+
+        # Monitors expect the full RGB range, TVs the limited one
+        targets['target_full_range'] = targets['is_monitor']
+        return targets
+
+    def changes(self, status, targets):
+        """ Compare the current status with the targets.
+
+            Returns the config.txt values to write, all at once, and a
+            list of reasons to log. No values means nothing to do.
+        """
+
+        values = OrderedDict()
+        reasons = []
+
+        if status['group'] != targets['target_group'] or \
+                status['mode'] != targets['target_mode']:
+            reasons.append('setting mode: {} {}'.format(
+                targets['target_group'], targets['target_mode']))
+            values.update(mode_config_values(targets['target_group'],
+                                             targets['target_mode']))
+
+        if status['full_range'] != targets['target_full_range']:
+            reasons.append('setting fullrange to: {}'.format(
+                targets['target_full_range']))
+            values['hdmi_pixel_encoding'] = \
+                2 if targets['target_full_range'] else 0
+
+        if status['overscan'] != targets['target_overscan']:
+            reasons.append('setting overscan to: {}'.format(
+                targets['target_overscan']))
+            if targets['target_overscan']:
+                values['disable_overscan'] = 0
+                overscan_value = OVERSCAN_VALUE
+            else:
+                values['disable_overscan'] = 1
+                overscan_value = 0
+            for key in OVERSCAN_KEYS:
+                values[key] = overscan_value
+
+        return values, reasons
@@ -0,0 +1,445 @@
+#!/usr/bin/env python
+
+# edid.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Decodes the raw EDID of a display, including its CEA-861 extension, into
+# the same dict display.parse_edid() builds from the edidparser output.
+#
+
+import struct
+
+
+BLOCK_SIZE = 128
+EDID_HEADER = '\x00\xff\xff\xff\xff\xff\xff\x00'
+
+CEA_EXTENSION_TAG = 0x02
+CEA_AUDIO_BLOCK = 1
+CEA_VIDEO_BLOCK = 2
+CEA_BASIC_AUDIO = 0x40
+
+MONITOR_NAME_TAG = 0xfc
+
+# Reduced blanking DMT modes all use a 160 pixel horizontal blank
+REDUCED_BLANKING_HBLANK = 160
+
+# The Pi can't drive more pixels per second than 1920x1200 at 60 Hz
+MAX_PIXEL_RATE = 1920 * 1200 * 60
+
+# CEA-861 video identification codes: (vic, width, height, interlaced, hz)
+CEA_MODES = [
+    (1, 640, 480, False, 60),
+    (2, 720, 480, False, 60),
+    (3, 720, 480, False, 60),
+    (4, 1280, 720, False, 60),
+    (5, 1920, 1080, True, 60),
+    (6, 1440, 480, True, 60),
+    (7, 1440, 480, True, 60),
+    (14, 1440, 480, False, 60),
+    (15, 1440, 480, False, 60),
+    (16, 1920, 1080, False, 60),
+    (17, 720, 576, False, 50),
+    (18, 720, 576, False, 50),
+    (19, 1280, 720, False, 50),
+    (20, 1920, 1080, True, 50),
+    (21, 1440, 576, True, 50),
+    (22, 1440, 576, True, 50),
+    (29, 1440, 576, False, 50),
+    (30, 1440, 576, False, 50),
+    (31, 1920, 1080, False, 50),
+    (32, 1920, 1080, False, 24),
+    (33, 1920, 1080, False, 25),
+    (34, 1920, 1080, False, 30),
+    (93, 3840, 2160, False, 24),
+    (94, 3840, 2160, False, 25),
+    (95, 3840, 2160, False, 30),
+]
+
+# VESA DMT modes as numbered by hdmi_mode: (mode, width, height, hz, rb)
+DMT_MODES = [
+    (4, 640, 480, 60, False),
+    (5, 640, 480, 72, False),
+    (6, 640, 480, 75, False),
+    (7, 640, 480, 85, False),
+    (8, 800, 600, 56, False),
+    (9, 800, 600, 60, False),
+    (10, 800, 600, 72, False),
+    (11, 800, 600, 75, False),
+    (12, 800, 600, 85, False),
+    (14, 848, 480, 60, False),
+    (16, 1024, 768, 60, False),
+    (17, 1024, 768, 70, False),
+    (18, 1024, 768, 75, False),
+    (19, 1024, 768, 85, False),
+    (21, 1152, 864, 75, False),
+    (22, 1280, 768, 60, True),
+    (23, 1280, 768, 60, False),
+    (24, 1280, 768, 75, False),
+    (25, 1280, 768, 85, False),
+    (27, 1280, 800, 60, True),
+    (28, 1280, 800, 60, False),
+    (29, 1280, 800, 75, False),
+    (30, 1280, 800, 85, False),
+    (32, 1280, 960, 60, False),
+    (33, 1280, 960, 85, False),
+    (35, 1280, 1024, 60, False),
+    (36, 1280, 1024, 75, False),
+    (37, 1280, 1024, 85, False),
+    (39, 1360, 768, 60, False),
+    (41, 1400, 1050, 60, True),
+    (42, 1400, 1050, 60, False),
+    (43, 1400, 1050, 75, False),
+    (44, 1400, 1050, 85, False),
+    (46, 1440, 900, 60, True),
+    (47, 1440, 900, 60, False),
+    (48, 1440, 900, 75, False),
+    (49, 1440, 900, 85, False),
+    (51, 1600, 1200, 60, False),
+    (52, 1600, 1200, 65, False),
+    (53, 1600, 1200, 70, False),
+    (54, 1600, 1200, 75, False),
+    (55, 1600, 1200, 85, False),
+    (57, 1680, 1050, 60, True),
+    (58, 1680, 1050, 60, False),
+    (59, 1680, 1050, 75, False),
+    (60, 1680, 1050, 85, False),
+    (62, 1792, 1344, 60, False),
+    (63, 1792, 1344, 75, False),
+    (65, 1856, 1392, 60, False),
+    (66, 1856, 1392, 75, False),
+    (68, 1920, 1200, 60, True),
+    (69, 1920, 1200, 60, False),
+    (70, 1920, 1200, 75, False),
+    (71, 1920, 1200, 85, False),
+    (73, 1920, 1440, 60, False),
+    (74, 1920, 1440, 75, False),
+    (76, 2560, 1600, 60, True),
+    (77, 2560, 1600, 60, False),
+    (78, 2560, 1600, 75, False),
+    (79, 2560, 1600, 85, False),
+    (81, 1366, 768, 60, False),
+    (82, 1920, 1080, 60, False),
+    (83, 1600, 900, 60, True),
+    (84, 2048, 1152, 60, True),
+    (85, 1280, 720, 60, False),
+    (86, 1366, 768, 60, True),
+]
+
+# Established timings, bytes 35 and 36 of the base block, most significant
+# bit first. Modes the Pi has no DMT number for are None.
+ESTABLISHED_TIMINGS = [
+    None, None, (640, 480, 60), None,
+    (640, 480, 72), (640, 480, 75), (800, 600, 56), (800, 600, 60),
+    (800, 600, 72), (800, 600, 75), None, None,
+    (1024, 768, 60), (1024, 768, 70), (1024, 768, 75), (1280, 1024, 75),
+]
+
+# Standard timing aspect ratios, EDID 1.3 and later
+STANDARD_ASPECTS = [(16, 10), (4, 3), (5, 4), (16, 9)]
+
+
+class Timing(object):
+    """ A detailed timing descriptor """
+
+    def __init__(self, pixel_clock, width, hblank, height, vblank,
+                 interlaced):
+        self.pixel_clock = pixel_clock
+        self.width = width
+        self.hblank = hblank
+        self.interlaced = interlaced
+        # interlaced descriptors give the lines of a single field
+        self.height = height * 2 if interlaced else height
+
+        # The exact rate, e.g. 59.94, as edidparser reports it. Modes are
+        # looked up by the nominal one, 60.
+        total = (width + hblank) * (height + vblank)
+        self.hz = round(float(pixel_clock) / total, 2) if total else 0.0
+        self.nominal_hz = int(round(self.hz))
+
+    def resolution(self):
+        return '{}x{}{}'.format(self.width, self.height,
+                                'i' if self.interlaced else 'p')
+
+
+def _checksum_ok(view, offset):
+    return sum(struct.unpack_from('128B', view, offset)) % 256 == 0
+
+
+def _parse_descriptor(view, offset):
+    """ Return a Timing, or the descriptor's (tag, text) if it isn't one """
+
+    pixel_clock, = struct.unpack_from('<H', view, offset)
+    if not pixel_clock:
+        tag = struct.unpack_from('B', view, offset + 3)[0]
+        text = view[offset + 5:offset + 18].tobytes()
+        return tag, text.split('\n')[0]
+
+    b = struct.unpack_from('16B', view, offset + 2)
+    width = b[0] | (b[2] & 0xf0) << 4
+    hblank = b[1] | (b[2] & 0x0f) << 8
+    height = b[3] | (b[5] & 0xf0) << 4
+    vblank = b[4] | (b[5] & 0x0f) << 8
+    interlaced = bool(b[15] & 0x80)
+
+    return Timing(pixel_clock * 10000, width, hblank, height, vblank,
+                  interlaced)
+
+
+def _parse_cea_extension(view, offset, edid_info):
+    dtd_start = struct.unpack_from('B', view, offset + 2)[0]
+    flags = struct.unpack_from('B', view, offset + 3)[0]
+    if flags & CEA_BASIC_AUDIO:
+        edid_info['audio'] = True
+
+    # data block collection
+    position = offset + 4
+    end = offset + min(dtd_start, BLOCK_SIZE - 1) if dtd_start else position
+    while position < end:
+        header = struct.unpack_from('B', view, position)[0]
+        tag, length = header >> 5, header & 0x1f
+        if position + 1 + length > end:
+            break
+
+        if tag == CEA_AUDIO_BLOCK and length:
+            edid_info['audio'] = True
+        elif tag == CEA_VIDEO_BLOCK:
+            for svd in struct.unpack_from('{}B'.format(length), view,
+                                          position + 1):
+                edid_info['vics'].add(svd & 0x7f)
+
+        position += 1 + length
+
+    # detailed timings following the data blocks
+    position = offset + dtd_start if dtd_start >= 4 else offset + BLOCK_SIZE
+    while position + 18 <= offset + BLOCK_SIZE - 1:
+        descriptor = _parse_descriptor(view, position)
+        if not isinstance(descriptor, Timing):
+            break
+        edid_info['timings'].append(descriptor)
+        position += 18
+
+
+def _standard_timings(view):
+    timings = []
+    data = struct.unpack_from('16B', view, 38)
+    for x, info in zip(data[::2], data[1::2]):
+        # 0x0101 marks an unused slot
+        if (x, info) == (1, 1) or x == 0:
+            continue
+
+        width = (x + 31) * 8
+        aspect_w, aspect_h = STANDARD_ASPECTS[info >> 6]
+        height = width * aspect_h / aspect_w
+        timings.append((width, height, (info & 0x3f) + 60))
+    return timings
+
+
+def _established_timings(view):
+    bits = struct.unpack_from('>H', view, 35)[0]
+    return [
+        timing for i, timing in enumerate(ESTABLISHED_TIMINGS)
+        if timing and bits & (0x8000 >> i)
+    ]
+
+
+def find_cea_mode(timing, vics=()):
+    """ The VIC of a detailed timing, preferring those the sink lists """
+
+    matches = [
+        vic for vic, width, height, interlaced, hz in CEA_MODES
+        if (width, height, interlaced, hz) ==
+        (timing.width, timing.height, timing.interlaced, timing.nominal_hz)
+    ]
+    listed = [vic for vic in matches if vic in vics]
+    return (listed or matches or [None])[0]
+
+
+def find_dmt_mode(width, height, hz, reduced_blanking=None):
+    matches = [
+        (mode, rb) for mode, w, h, mode_hz, rb in DMT_MODES
+        if (w, h, mode_hz) == (width, height, hz)
+    ]
+    if reduced_blanking is not None:
+        exact = [m for m in matches if m[1] == reduced_blanking]
+        matches = exact or matches
+    return matches[0][0] if matches else None
+
+
+def _cea_resolution(vic):
+    for mode, width, height, interlaced, hz in CEA_MODES:
+        if mode == vic:
+            return width, height, interlaced, hz
+
+
+def _pixel_rate(width, height, hz):
+    return width * height * hz
+
+
+def decode_edid(data):
+    """ Decode a raw EDID, as read from sysfs or dumped by tvservice -d.
+
+        Returns the dict display.parse_edid() builds, or None when the
+        blob is not a valid EDID or its preferred timing is not a CEA or
+        DMT mode, in which case edidparser should be asked instead.
+    """
+
+    if not data or len(data) < BLOCK_SIZE:
+        return None
+
+    view = memoryview(data)
+    if view[0:8].tobytes() != EDID_HEADER or not _checksum_ok(view, 0):
+        return None
+
+    edid_info = {
+        'audio': False,
+        'vics': set(),
+        'timings': [],
+        'name': None,
+        'has_cea': False,
+    }
+
+    for offset in (54, 72, 90, 108):
+        descriptor = _parse_descriptor(view, offset)
+        if isinstance(descriptor, Timing):
+            edid_info['timings'].append(descriptor)
+        elif descriptor[0] == MONITOR_NAME_TAG:
+            edid_info['name'] = descriptor[1]
+
+    extensions = struct.unpack_from('B', view, 126)[0]
+    for i in xrange(1, extensions + 1):
+        offset = i * BLOCK_SIZE
+        if offset + BLOCK_SIZE > len(view):
+            break
+        if struct.unpack_from('B', view, offset)[0] != CEA_EXTENSION_TAG or \
+                not _checksum_ok(view, offset):
+            continue
+
+        edid_info['has_cea'] = True
+        _parse_cea_extension(view, offset, edid_info)
+
+    if not edid_info['timings']:
+        return None
+
+    return _build_edid(view, edid_info)
+
+
+def _build_edid(view, edid_info):
+    edid = dict()
+    edid['dmt_found'] = False
+    edid['hdmi_audio'] = edid_info['has_cea'] and edid_info['audio']
+    edid['screen_size'] = struct.unpack_from('B', view, 21)[0]
+    edid['model'] = (edid_info['name'] or '').decode('ascii', 'ignore') \
+        .strip()
+
+    # DMT modes the sink advertises. Detailed timings don't count, TVs list
+    # their CEA modes there too.
+    dmt_timings = set(_established_timings(view) + _standard_timings(view))
+
+    # The first detailed timing is the preferred one. HDMI sinks get CEA
+    # modes, plain DVI ones DMT.
+    preferred = edid_info['timings'][0]
+    vic = None
+    if edid_info['has_cea']:
+        vic = find_cea_mode(preferred, edid_info['vics'])
+
+    if vic:
+        edid['preferred_group'] = 'CEA'
+        edid['preferred_mode'] = vic
+    else:
+        reduced_blanking = preferred.hblank == REDUCED_BLANKING_HBLANK
+        mode = None
+        if not preferred.interlaced:
+            mode = find_dmt_mode(preferred.width, preferred.height,
+                                 preferred.nominal_hz, reduced_blanking)
+        if not mode:
+            return None
+        edid['preferred_group'] = 'DMT'
+        edid['preferred_mode'] = mode
+
+    edid['preferred_res'] = preferred.resolution()
+    edid['preferred_hz'] = preferred.hz
+
+    # edidparser lists DMT modes at their nominal rate, so a preferred
+    # 59.94 Hz timing never matches one
+    if edid['preferred_group'] == 'CEA':
+        edid['dmt_found'] = (preferred.width, preferred.height,
+                             preferred.nominal_hz) in dmt_timings and \
+            preferred.hz == preferred.nominal_hz and \
+            not preferred.interlaced and \
+            find_dmt_mode(preferred.width, preferred.height,
+                          preferred.nominal_hz) is not None
+
+    # Fall back to the largest supported mode when the preferred one needs
+    # a higher pixel rate than the Pi can drive
+    edid['target_group'] = edid['preferred_group']
+    edid['target_mode'] = edid['preferred_mode']
+    if _pixel_rate(preferred.width, preferred.height,
+                   preferred.nominal_hz) > \
+            MAX_PIXEL_RATE:
+        found = _find_fallback_mode(edid_info['vics'], dmt_timings)
+        if found:
+            edid['found_group'], edid['found_mode'] = found
+            edid['target_group'], edid['target_mode'] = found
+
+    # is_monitor
+    if edid['target_group'] == 'DMT':
+        edid['is_monitor'] = True
+    elif 'TV' in edid['model']:
+        edid['is_monitor'] = False
+    else:
+        edid['is_monitor'] = edid['dmt_found'] or edid['screen_size'] < 60
+
+    # always disable overscan
+    edid['target_overscan'] = False
+
+    return edid
+
+
+def _find_fallback_mode(vics, dmt_timings):
+    candidates = []
+    for vic in vics:
+        mode = _cea_resolution(vic)
+        if mode and not mode[2]:
+            width, height, _, hz = mode
+            candidates.append((width * height, hz, 'CEA', vic))
+
+    for width, height, hz in dmt_timings:
+        mode = find_dmt_mode(width, height, hz)
+        if mode:
+            candidates.append((width * height, hz, 'DMT', mode))
+
+    candidates = [
+        c for c in candidates if c[0] * c[1] <= MAX_PIXEL_RATE
+    ]
+    if not candidates:
+        return None
+
+    _, _, group, mode = max(candidates)
+    return group, mode
+
+
+def read_edid_id(data):
+    """ The manufacturer and product code of a raw EDID, e.g. 'GSM5B09'.
+
+        Unlike the monitor name, this identifies a model even when the
+        display leaves the name empty or fills it with garbage.
+    """
+
+    if not data or len(data) < 12:
+        return None
+
+    view = memoryview(data)
+    if view[0:8].tobytes() != EDID_HEADER:
+        return None
+
+    manufacturer, = struct.unpack_from('>H', view, 8)
+    product, = struct.unpack_from('<H', view, 10)
+
+    letters = [(manufacturer >> shift) & 0x1f for shift in (10, 5, 0)]
+    if not all(1 <= letter <= 26 for letter in letters):
+        return None
+
+    return ''.join(chr(ord('A') - 1 + letter) for letter in letters) + \
+        '{:04X}'.format(product)
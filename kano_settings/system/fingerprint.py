@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# fingerprint.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# A cheap summary of the hardware and config.txt kano-settings-onboot last
+# saw settled. If nothing changed since, there is nothing to configure and
+# the expensive display probes can be skipped.
+#
+# The fingerprint is kept outside /boot, so checking it never touches the
+# FAT partition.
+#
+
+import os
+import json
+import hashlib
+
+from kano_settings.boot_config import boot_config_standard_path
+from kano_settings.system.display import display_probe
+from kano_settings.system.board import get_board_revision
+
+
+fingerprint_path = '/var/cache/kano-settings/onboot-fingerprint.json'
+
+
+def hash_data(data):
+    return hashlib.sha1(data or '').hexdigest()
+
+
+def hash_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return hash_data(f.read())
+    except IOError:
+        return None
+
+
+def get_fingerprint():
+    """ Fingerprint of the display, the board and config.txt.
+
+        The EDID comes from sysfs where the kernel provides it, otherwise
+        from a single tvservice dump which later probes reuse. tvservice
+        can hang, so at boot this should run as a probe with a timeout.
+    """
+
+    return {
+        'edid': hash_data(display_probe.edid_bytes()),
+        'board': get_board_revision(),
+        'config': hash_file(boot_config_standard_path)
+    }
+
+
+def refresh_fingerprint(fingerprint):
+    """ The fingerprint after config.txt was written, without asking the
+        display again
+    """
+
+    fingerprint = dict(fingerprint)
+    fingerprint['config'] = hash_file(boot_config_standard_path)
+    return fingerprint
+
+
+def load_fingerprint():
+    try:
+        with open(fingerprint_path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def save_fingerprint(fingerprint):
+    directory = os.path.dirname(fingerprint_path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tmp_path = fingerprint_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(fingerprint, f, sort_keys=True)
+    os.rename(tmp_path, fingerprint_path)
@@ -8,110 +8,249 @@
 # Backend overclock functions
 #
 
-from kano_settings.boot_config import set_config_value, get_config_value
+import os
+import re
+import json
+
+from kano_settings.boot_config import set_config_values, get_config_values, \
+    has_config_value
 from kano.logging import logger
+from kano.utils import is_model_2_b
 from kano_settings.config_file import set_setting
+from kano_settings.system.board import get_board_revision
 
 
-CLOCK_RPI1 = False
-CLOCK_RPI2 = True
+# Boards are keyed by name in the profiles, the benchmark results and
+# CLOCK_MODES, so a new board in the data file gets its own profiles
+CLOCK_RPI1 = 'pi1'
+CLOCK_RPI2 = 'pi2'
 
 CLOCK_KEYS = ['arm_freq', 'core_freq','sdram_freq', 'over_voltage']
 
-CLOCK_MODES = {
-
-    CLOCK_RPI1: {
-        'modes': ['None', 'Modest', 'Medium', 'High', 'Turbo'],
-        'default': 'High',
-        'warning': ['Turbo'],
-        'values': {
-            'None': {
-                'arm_freq': 700,
-                'core_freq': 250,
-                'sdram_freq': 400,
-                'over_voltage': 0
-            },
-            'Modest': {
-                'arm_freq':  800,
-                'core_freq':  250,
-                'sdram_freq':  400,
-                'over_voltage':  0
-            },
-            'Medium': {
-                'arm_freq': 900,
-                'core_freq': 250,
-                'sdram_freq': 450,
-                'over_voltage': 2
-            },
-            'High': {
-                'arm_freq': 950,
-                'core_freq': 250,
-                'sdram_freq': 450,
-                'over_voltage': 6,
-            },
-            'Turbo': {
-                'arm_freq': 1000,
-                'core_freq': 500,
-                'sdram_freq': 600,
-                'over_voltage': 6,
+# config.txt section filters are written as [name], e.g. [pi2]
+SECTION_NAME = re.compile(r'^[A-Za-z0-9_]+$')
+
+# The clock profiles of every board, and which board each revision code
+# is, are kept in a data file so new boards need no code changes
+profiles_file = 'overclock-profiles.json'
+rel_profiles_path = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', '..', profiles_file))
+abs_profiles_path = os.path.join('/usr/share/kano-settings/data',
+                                 profiles_file)
+
+
+# Used when the profiles file can't be read, so that the settings, the CLI
+# and the boot scripts keep working. Boards are then told apart by
+# is_model_2_b() as there is no revision table.
+BUILTIN_PROFILES = {
+    'boards': {
+        'pi1': {
+            'section': 'pi1',
+            'modes': ['None', 'Modest', 'Medium', 'High', 'Turbo'],
+            'default': 'High',
+            'warning': ['Turbo'],
+            'values': {
+                'None': {'arm_freq': 700, 'core_freq': 250, 'sdram_freq': 400, 'over_voltage': 0},
+                'Modest': {'arm_freq': 800, 'core_freq': 250, 'sdram_freq': 400, 'over_voltage': 0},
+                'Medium': {'arm_freq': 900, 'core_freq': 250, 'sdram_freq': 450, 'over_voltage': 2},
+                'High': {'arm_freq': 950, 'core_freq': 250, 'sdram_freq': 450, 'over_voltage': 6},
+                'Turbo': {'arm_freq': 1000, 'core_freq': 500, 'sdram_freq': 600, 'over_voltage': 6}
             }
-        }
-    },
-
-    CLOCK_RPI2: {
-        'modes': ['Standard', 'Overclocked'],
-        'default': 'Standard',
-        'warning': ['Overclocked'],
-        'values': {
-            'Standard': {
-                'arm_freq': 900,
-                'core_freq': 250,
-                'sdram_freq': 450,
-                'over_voltage': 0
-            },
-            # from https://github.com/asb/raspi-config/blob/4ee1fde44ee544a7eade9ecf94141eb40aabab60/raspi-config#L288
-            'Overclocked': {
-                'arm_freq': 1000,
-                'core_freq': 500,
-                'sdram_freq': 500,
-                'over_voltage': 2
+        },
+        'pi2': {
+            'section': 'pi2',
+            'modes': ['Standard', 'Overclocked'],
+            'default': 'Standard',
+            'warning': ['Overclocked'],
+            'values': {
+                'Standard': {'arm_freq': 900, 'core_freq': 250, 'sdram_freq': 450, 'over_voltage': 0},
+                'Overclocked': {'arm_freq': 1000, 'core_freq': 500, 'sdram_freq': 500, 'over_voltage': 2}
             }
         }
     }
-
 }
 
 
-def values_equal(v1, v2):
-    return all([v1[x] == v2[x] for x in CLOCK_KEYS])
+def load_profiles(path=None):
+    if path is None:
+        path = rel_profiles_path
+        if not os.path.exists(path):
+            path = abs_profiles_path
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def clock_values_key(values):
+    return tuple(values.get(key) for key in CLOCK_KEYS)
+
+
+def _is_int(value):
+    return isinstance(value, (int, long)) and not isinstance(value, bool)
+
+
+def check_profiles(data):
+    """ Raise ValueError unless `data` is a usable profiles table.
+
+        The values end up in config.txt as root, so anything but integers
+        is refused.
+    """
+
+    if not isinstance(data, dict) or not isinstance(data.get('boards'), dict):
+        raise ValueError('no boards in the overclock profiles')
+
+    for board, profiles in data['boards'].iteritems():
+        if not isinstance(profiles, dict):
+            raise ValueError('board {} has no profiles'.format(board))
+
+        section = profiles.get('section')
+        if not isinstance(section, basestring) or \
+                not SECTION_NAME.match(section):
+            raise ValueError('board {} has an invalid section'.format(board))
+
+        values = profiles.get('values')
+        if not isinstance(values, dict) or \
+                not isinstance(profiles.get('modes'), list) or \
+                not isinstance(profiles.get('warning'), list) or \
+                sorted(profiles['modes']) != sorted(values) or \
+                profiles.get('default') not in values or \
+                not set(profiles['warning']) <= set(values):
+            raise ValueError('board {} has inconsistent modes'.format(board))
+
+        for mode, mode_values in values.iteritems():
+            if not isinstance(mode_values, dict) or \
+                    sorted(mode_values) != sorted(CLOCK_KEYS) or \
+                    not all(_is_int(v) for v in mode_values.itervalues()):
+                raise ValueError('mode {} of board {} has invalid clock '
+                                 'values'.format(mode, board))
+
+    revisions = data.get('revisions', {})
+    if not isinstance(revisions, dict) or \
+            not set(revisions.itervalues()) <= set(data['boards']):
+        raise ValueError('revisions refer to unknown boards')
+
+
+class ProfileRegistry(object):
+    """ Overclock profiles per board, with a reverse index from the clock
+        values to the mode they belong to.
+    """
+
+    def __init__(self, data):
+        check_profiles(data)
+        self.boards = data['boards']
+        self.revisions = data.get('revisions', {})
+        self._modes_by_values = dict(
+            (board, dict(
+                (clock_values_key(values), mode)
+                for mode, values in profiles['values'].iteritems()
+            ))
+            for board, profiles in self.boards.iteritems()
+        )
+
+    def board_for_revision(self, revision):
+        return self.revisions.get(revision)
+
+    def profiles(self, board):
+        return self.boards[board]
 
+    def find_mode(self, board, values):
+        return self._modes_by_values[board].get(clock_values_key(values))
 
-def match_overclock_value(is_pi2):
+
+def load_registry():
+    try:
+        return ProfileRegistry(load_profiles())
+    except (IOError, ValueError, KeyError) as e:
+        logger.error('Could not load the overclock profiles, '
+                     'using the built-in ones: {}'.format(e))
+        return ProfileRegistry(BUILTIN_PROFILES)
+
+
+registry = load_registry()
+
+CLOCK_MODES = dict(
+    (board, registry.profiles(board)) for board in registry.boards
+)
+
+# config.txt filters under which each chip keeps its own clock values
+CLOCK_SECTIONS = dict(
+    (board, profiles['section'])
+    for board, profiles in CLOCK_MODES.iteritems()
+)
+
+_board = None
+
+
+def detect_board():
+    """ Which board we run on, e.g. 'pi2', worked out once per process """
+
+    global _board
+
+    if _board is None:
+        board = registry.board_for_revision(get_board_revision())
+        if board is None:
+            board = CLOCK_RPI2 if is_model_2_b() else CLOCK_RPI1
+        _board = board
+
+    return _board
+
+
+def get_overclock_values(board):
+    """ The clock values the firmware applies on the given board """
+    return get_config_values(CLOCK_KEYS, CLOCK_SECTIONS[board])
+
+
+def find_overclock_mode(values, board):
+    return registry.find_mode(board, values)
+
+
+def match_overclock_value(board):
     """ which overlock gui setting matches our current set of values?"""
-    curr = {}
-    for key in CLOCK_KEYS:
-        curr[key] = get_config_value(key)
+    return find_overclock_mode(get_overclock_values(board), board)
+
+
+def has_overclock_sections():
+    """ Does config.txt keep separate clock values for each chip? """
+    return all(has_config_value('arm_freq', section)
+               for section in CLOCK_SECTIONS.itervalues())
 
-    for row in CLOCK_MODES[is_pi2]['values']:
-        if values_equal(CLOCK_MODES[is_pi2]['values'][row], curr):
-            return row
-    return None
 
+def migrate_overclock_values(legacy_backups):
+    """ Move flat clock values into per-chip sections of config.txt.
 
-def backup_overclock_values(backup_config):
-    backup_config.ensure_exists()
-    for key in CLOCK_KEYS:
-        backup_config.set_value(key, get_config_value(key))
+        Each chip keeps the flat values if they are valid for it, otherwise
+        the values from its legacy backup file, otherwise its default mode.
+        Sections which already exist are left alone.
+        Should be called inside a boot_config transaction.
+    """
 
+    flat_values = get_config_values(CLOCK_KEYS)
 
-def restore_overclock_values(backup_config):
-    for key in CLOCK_KEYS:
-        set_config_value(key, backup_config.get_value(key))
+    for board, section in CLOCK_SECTIONS.iteritems():
+        if has_config_value('arm_freq', section):
+            continue
 
+        mode = find_overclock_mode(flat_values, board)
 
-def change_overclock_value(config, is_pi2):
+        backup = legacy_backups.get(board)
+        if mode is None and backup is not None and backup.exists():
+            mode = find_overclock_mode(backup.get_values(CLOCK_KEYS), board)
+
+        if mode is None:
+            mode = CLOCK_MODES[board]['default']
+
+        logger.info('migrating {} clock settings to mode {}'.format(
+            section, mode))
+        values = CLOCK_MODES[board]['values'][mode]
+        set_config_values([(key, values[key]) for key in CLOCK_KEYS], section)
+
+    # The sections now hold everything, comment out the flat values
+    set_config_values([(key, None) for key in CLOCK_KEYS])
+
+
+def change_overclock_value(config, board):
     try:
-        values = CLOCK_MODES[is_pi2]['values'][config]
+        values = CLOCK_MODES[board]['values'][config]
     except KeyError:
         logger.error(
             'kano-settings: set_overclock: SetOverclock: set_overclock(): '
@@ -129,17 +268,19 @@ def change_overclock_value(config, is_pi2):
         .format(config, **values)
     )
 
-    # Apply changes
-    for val in values:
-        set_config_value(val, values[val])
+    # Apply changes, only for the chip they were chosen for
+    set_config_values(
+        [(key, values[key]) for key in CLOCK_KEYS],
+        CLOCK_SECTIONS[board]
+    )
 
     # Update config
     set_setting("Overclocking", config)
 
 
-def set_default_overclock_values(is_pi2):
-    change_overclock_value(CLOCK_MODES[is_pi2]['default'], is_pi2)
+def set_default_overclock_values(board):
+    change_overclock_value(CLOCK_MODES[board]['default'], board)
 
 
-def is_dangerous_overclock_value(config, is_pi2):
-    return (config in CLOCK_MODES[is_pi2]['warning'])
+def is_dangerous_overclock_value(config, board):
+    return (config in CLOCK_MODES[board]['warning'])
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+# overclock_bench.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Measures how fast, and how stable, the overclock mode the Pi booted with
+# is on this particular board.
+#
+# A fixed CPU and memory workload runs while the temperature and the
+# firmware's throttling flags are sampled. Results are kept per board and
+# mode, so once every mode has been tried the fastest stable one can be
+# recommended.
+#
+# All the hardware is read through files, see SysfsPaths, so the harness
+# can be tested against stub files.
+#
+
+import os
+import json
+import time
+import hashlib
+import threading
+import subprocess
+
+
+results_path = '/var/cache/kano-settings/overclock-results.json'
+
+# A run hotter than this is not considered stable, even if the firmware
+# didn't throttle yet
+MAX_STABLE_TEMPERATURE = 80.0
+
+# get_throttled bits: currently under-voltage, frequency capped, throttled
+# and soft temperature limit; the same four shifted by 16 mean they
+# happened at some point since boot
+THROTTLED_NOW_MASK = 0xf
+THROTTLED_SINCE_BOOT_MASK = 0xf0000
+
+WORKLOAD_DURATION = 10
+SAMPLE_INTERVAL = 0.5
+MEMORY_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class SysfsPaths(object):
+    """ Where the hardware state is read from """
+
+    def __init__(self, temperature='/sys/class/thermal/thermal_zone0/temp',
+                 throttled='/sys/devices/platform/soc/soc:firmware/get_throttled',
+                 cpu_freq='/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq'):
+        self.temperature = temperature
+        self.throttled = throttled
+        self.cpu_freq = cpu_freq
+
+
+default_paths = SysfsPaths()
+
+
+def _read_number(path, base=10):
+    try:
+        with open(path) as f:
+            return int(f.read().strip(), base)
+    except (IOError, ValueError):
+        return None
+
+
+def read_temperature(paths=default_paths):
+    """ SoC temperature in degrees Celsius """
+
+    millidegrees = _read_number(paths.temperature)
+    if millidegrees is None:
+        return None
+    return millidegrees / 1000.0
+
+
+def read_throttled(paths=default_paths):
+    """ The firmware's throttling flags, None if they can't be read """
+
+    flags = _read_number(paths.throttled, 16)
+    if flags is not None or os.path.exists(paths.throttled):
+        return flags
+
+    # Older kernels only expose them through the firmware tool
+    try:
+        output = subprocess.check_output(['vcgencmd', 'get_throttled'])
+        return int(output.split('=')[1], 16)
+    except (OSError, subprocess.CalledProcessError, IndexError, ValueError):
+        return None
+
+
+def read_cpu_freq(paths=default_paths):
+    """ Current ARM frequency in MHz """
+
+    khz = _read_number(paths.cpu_freq)
+    if khz is None:
+        return None
+    return khz / 1000
+
+
+def cpu_memory_workload(duration):
+    """ Hash and copy a fixed block for `duration` seconds.
+
+        Returns the number of rounds done per second.
+    """
+
+    block = bytearray(MEMORY_BLOCK_SIZE)
+    rounds = 0
+    start = time.time()
+    while True:
+        copy = bytearray(block)
+        hashlib.sha1(copy).digest()
+        rounds += 1
+
+        elapsed = time.time() - start
+        if elapsed >= duration:
+            return rounds / elapsed
+
+
+class Sampler(threading.Thread):
+    """ Records the temperature and throttling flags in the background """
+
+    def __init__(self, paths=default_paths, interval=SAMPLE_INTERVAL):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.paths = paths
+        self.interval = interval
+        self.temperatures = []
+        self.throttled = []
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        temperature = read_temperature(self.paths)
+        if temperature is not None:
+            self.temperatures.append(temperature)
+
+        flags = read_throttled(self.paths)
+        if flags is not None:
+            self.throttled.append(flags)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        # make sure the state at the end of the run is included
+        self.sample()
+
+
+def validate_run(score, temperatures, throttled):
+    """ Summarise a run and decide whether it was stable """
+
+    flags = 0
+    for sample in throttled:
+        flags |= sample
+
+    # Throttling that had happened before the run started is not its fault
+    if throttled:
+        flags &= ~(throttled[0] & THROTTLED_SINCE_BOOT_MASK)
+
+    max_temperature = max(temperatures) if temperatures else None
+    stable = not (flags & (THROTTLED_NOW_MASK | THROTTLED_SINCE_BOOT_MASK))
+    if max_temperature is not None and \
+            max_temperature >= MAX_STABLE_TEMPERATURE:
+        stable = False
+
+    return {
+        'score': score,
+        'max_temperature': max_temperature,
+        'throttled': flags,
+        'stable': stable,
+        'time': int(time.time())
+    }
+
+
+def run_benchmark(duration=WORKLOAD_DURATION, paths=default_paths,
+                  workload=cpu_memory_workload, interval=SAMPLE_INTERVAL):
+    sampler = Sampler(paths, interval)
+    sampler.sample()
+    sampler.start()
+    try:
+        score = workload(duration)
+    finally:
+        sampler.stop()
+
+    result = validate_run(score, sampler.temperatures, sampler.throttled)
+    result['cpu_freq'] = read_cpu_freq(paths)
+    return result
+
+
+class ResultsStore(object):
+    """ The latest benchmark result of every mode, per board """
+
+    def __init__(self, path=results_path):
+        self.path = path
+        self._data = None
+
+    def data(self):
+        if self._data is None:
+            try:
+                with open(self.path) as f:
+                    self._data = json.load(f)
+            except (IOError, ValueError):
+                self._data = {}
+        return self._data
+
+    def record(self, board, mode, result):
+        self.data().setdefault(board, {})[mode] = result
+        self.save()
+
+    def get(self, board, mode):
+        return self.data().get(board, {}).get(mode)
+
+    def results(self, board):
+        return self.data().get(board, {})
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data(), f, sort_keys=True)
+        os.rename(tmp_path, self.path)
+
+
+def recommend_mode(board, store=None):
+    """ The fastest mode which ran stable on this board, if any was tried """
+
+    store = store or ResultsStore()
+    stable = [
+        (result['score'], mode)
+        for mode, result in store.results(board).iteritems()
+        if result.get('stable') and mode != 'Custom'
+    ]
+    if not stable:
+        return None
+    return max(stable)[1]
+
+
+def benchmark_active_profile(board, store=None, duration=WORKLOAD_DURATION,
+                             paths=default_paths):
+    """ Benchmark the mode set in config.txt and record the result.
+
+        That is the running mode unless it was changed since boot. Returns
+        the mode name and the result. Values which match none of the modes
+        are recorded as 'Custom'.
+    """
+
+    from kano_settings.system.overclock import match_overclock_value
+
+    store = store or ResultsStore()
+    mode = match_overclock_value(board) or 'Custom'
+    result = run_benchmark(duration, paths)
+    store.record(board, mode, result)
+    return mode, result
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# screen_history.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# History of the screens kano-settings-onboot has seen, kept on the boot
+# partition so it can be read from any computer for troubleshooting.
+#
+# Each probe result is appended as one line of compact JSON. A record is
+# only written when the fingerprint differs from the last one, and the log
+# is rotated once it grows past MAX_LOG_SIZE, so the SD card sees a handful
+# of small writes rather than a rewrite on every boot.
+#
+
+import os
+import json
+import time
+
+
+history_path = '/boot/screen.log'
+
+MAX_LOG_SIZE = 64 * 1024
+ROTATIONS = 2
+
+
+def rotated_path(path, index):
+    return '{}.{}'.format(path, index)
+
+
+def rotate(path=history_path, rotations=ROTATIONS):
+    """ screen.log becomes screen.log.1, which becomes screen.log.2, ... """
+
+    oldest = rotated_path(path, rotations)
+    if os.path.exists(oldest):
+        os.remove(oldest)
+
+    for index in xrange(rotations - 1, 0, -1):
+        if os.path.exists(rotated_path(path, index)):
+            os.rename(rotated_path(path, index),
+                      rotated_path(path, index + 1))
+
+    if os.path.exists(path):
+        os.rename(path, rotated_path(path, 1))
+
+
+def make_record(info, fingerprint=None, timestamp=None):
+    record = dict(info)
+    record['time'] = int(timestamp or time.time())
+    record['fingerprint'] = fingerprint
+    return record
+
+
+def append_record(record, path=history_path, max_size=MAX_LOG_SIZE,
+                  rotations=ROTATIONS):
+    line = json.dumps(record, sort_keys=True, separators=(',', ':')) + '\n'
+
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+
+    if size and size + len(line) > max_size:
+        rotate(path, rotations)
+
+    with open(path, 'a') as log_file:
+        log_file.write(line)
+        log_file.flush()
+        os.fsync(log_file.fileno())
+
+
+def read_records(path=history_path, rotations=ROTATIONS):
+    """ Every record, oldest first, including the rotated logs.
+
+        Lines which aren't records, such as the pretty printed screen.log
+        of older versions, are skipped.
+    """
+
+    paths = [rotated_path(path, i) for i in xrange(rotations, 0, -1)]
+    paths.append(path)
+
+    records = []
+    for log_path in paths:
+        try:
+            with open(log_path) as log_file:
+                lines = log_file.readlines()
+        except IOError:
+            continue
+
+        for line in lines:
+            if not line.startswith('{'):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and 'time' in record:
+                records.append(record)
+
+    return records
+
+
+def last_record(path=history_path):
+    """ The newest record, without reading the rotated logs """
+
+    records = read_records(path, rotations=0)
+    return records[-1] if records else None
+
+
+def record_screen(info, fingerprint, path=history_path):
+    """ Append the probe results unless the fingerprint is unchanged.
+
+        Returns True if a record was written.
+    """
+
+    last = last_record(path)
+    if last is not None and last.get('fingerprint') == fingerprint:
+        return False
+
+    append_record(make_record(info, fingerprint), path)
+    return True
@@ -10,10 +10,10 @@
 import os
 from kano.logging import logger
 from kano_settings import common
-from kano_settings.config_file import username
+from kano.utils import get_user_unsudoed
 
 # These are where we write the user settings
-kdesk_config = os.path.join("/home", username, ".kdeskrc")
+kdesk_config = os.path.join("/home", get_user_unsudoed(), ".kdeskrc")
 
 # This is where the default kdesk settings are kept
 usr_kdesk_config = "/usr/share/kano-desktop/kdesk/.kdeskrc"
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+# watcher.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# Publishes changes to the settings file and /boot/config.txt to
+# interested parties, using inotify instead of polling.
+#
+# Callbacks run on the watcher thread. GUI code must hand the work over to
+# the main loop, e.g. with GObject.idle_add.
+#
+
+import os
+import threading
+import pyinotify
+
+from kano.logging import logger
+
+from kano_settings.boot_config import real_config
+from kano_settings.config_file import settings_store
+from kano_settings.settings_schema import load_settings
+
+
+SETTINGS_CHANGED = 'settings'
+BOOT_CONFIG_CHANGED = 'boot_config'
+
+# Files are usually replaced by a rename, so watch their directories
+WATCH_MASK = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO | \
+    pyinotify.IN_DELETE
+
+
+class ChangeEvent(object):
+    """ A watched file changed.
+
+        For the settings file, `changed_keys` lists the settings whose value
+        differs from the previous version of the file.
+    """
+
+    def __init__(self, kind, path, changed_keys=None):
+        self.kind = kind
+        self.path = path
+        self.changed_keys = changed_keys or []
+
+    def __repr__(self):
+        return 'ChangeEvent({}, {}, {})'.format(
+            self.kind, self.path, self.changed_keys)
+
+
+class ChangeWatcher(object):
+    def __init__(self):
+        self._paths = {}
+        self._subscribers = {}
+        self._settings_snapshot = {}
+        self._lock = threading.Lock()
+        self._notifier = None
+
+    def watch(self, path, kind):
+        self._paths[os.path.abspath(path)] = kind
+
+    def subscribe(self, kind, callback):
+        with self._lock:
+            self._subscribers.setdefault(kind, []).append(callback)
+
+    def unsubscribe(self, kind, callback):
+        with self._lock:
+            try:
+                self._subscribers.get(kind, []).remove(callback)
+            except ValueError:
+                pass
+
+    def is_running(self):
+        return self._notifier is not None
+
+    def start(self):
+        if self.is_running():
+            return
+
+        self._settings_snapshot = self._read_settings()
+
+        manager = pyinotify.WatchManager()
+        for directory in set(os.path.dirname(p) for p in self._paths):
+            if os.path.isdir(directory):
+                manager.add_watch(directory, WATCH_MASK)
+
+        self._notifier = pyinotify.ThreadedNotifier(manager, self._on_event)
+        self._notifier.daemon = True
+        self._notifier.start()
+
+    def stop(self):
+        if not self.is_running():
+            return
+
+        self._notifier.stop()
+        self._notifier = None
+
+    def publish(self, event):
+        with self._lock:
+            callbacks = list(self._subscribers.get(event.kind, []))
+
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error('watcher: subscriber failed on {}: {}'
+                             .format(event, e))
+
+    def _read_settings(self):
+        return load_settings(settings_store.path)
+
+    def _on_event(self, inotify_event):
+        path = inotify_event.pathname
+        kind = self._paths.get(path)
+        if kind is None:
+            return
+
+        changed_keys = None
+        if kind == SETTINGS_CHANGED:
+            settings = self._read_settings()
+            old = self._settings_snapshot
+            changed_keys = sorted(
+                key for key in set(old) | set(settings)
+                if old.get(key) != settings.get(key)
+            )
+            self._settings_snapshot = settings
+            if not changed_keys:
+                return
+
+        self.publish(ChangeEvent(kind, path, changed_keys))
+
+
+watcher = ChangeWatcher()
+
+
+def _run_now(func):
+    func()
+
+
+def start_watching(dispatch=_run_now):
+    """ Start the shared watcher and hook the in-process caches to it.
+
+        The caches are not thread safe, so `dispatch` hands their
+        invalidation over to the thread which reads them; the GUI passes
+        GObject.idle_add.
+    """
+
+    if watcher.is_running():
+        return watcher
+
+    watcher.watch(settings_store.path, SETTINGS_CHANGED)
+    watcher.watch(real_config.path, BOOT_CONFIG_CHANGED)
+
+    watcher.subscribe(SETTINGS_CHANGED,
+                      lambda event: dispatch(settings_store.changed_on_disk))
+    watcher.subscribe(BOOT_CONFIG_CHANGED,
+                      lambda event: dispatch(real_config.changed_on_disk))
+
+    watcher.start()
+    return watcher
+
+
+def stop_watching():
+    watcher.stop()
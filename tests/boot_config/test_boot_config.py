@@ -0,0 +1,210 @@
+#
+# test_boot_config.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests reading and writing /boot/config.txt
+#
+
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.boot_config import BootConfig
+
+
+SAMPLE_CONFIG = '''### kano_screen_used: SAMSUNG
+# uncomment if you get no picture on HDMI for a default "safe" mode
+#hdmi_safe=1
+disable_overscan=1
+overscan_left=0
+#hdmi_group=1
+hdmi_mode=16
+[pi2]
+arm_freq=900
+'''
+
+
+class BootConfigTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'config.txt')
+        with open(self.path, 'w') as config_file:
+            config_file.write(SAMPLE_CONFIG)
+        self.config = BootConfig(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read_lines(self):
+        with open(self.path) as config_file:
+            return config_file.read().splitlines()
+
+
+class GetValue(BootConfigTestCase):
+
+    def test_int_value(self):
+        self.assertEqual(self.config.get_value('hdmi_mode'), 16)
+
+    def test_commented_value(self):
+        self.assertEqual(self.config.get_value('hdmi_group'), 0)
+
+    def test_missing_value(self):
+        self.assertEqual(self.config.get_value('hdmi_drive'), 0)
+
+
+class SetValues(BootConfigTestCase):
+
+    def test_replace_commented(self):
+        self.config.set_value('hdmi_group', 2)
+        self.assertIn('hdmi_group=2', self.read_lines())
+        self.assertNotIn('#hdmi_group=1', self.read_lines())
+
+    def test_comment_out(self):
+        self.config.set_value('hdmi_mode', None)
+        self.assertIn('#hdmi_mode=0', self.read_lines())
+        self.assertEqual(self.config.get_value('hdmi_mode'), 0)
+
+    def test_append(self):
+        self.config.set_value('hdmi_drive', 2)
+        self.assertEqual(self.read_lines()[-1], 'hdmi_drive=2')
+
+    def test_batch_keeps_other_lines(self):
+        self.config.set_values([
+            ('overscan_left', 16),
+            ('hdmi_mode', 4),
+            ('config_hdmi_boost', 4)
+        ])
+        self.assertEqual(self.read_lines(), [
+            '### kano_screen_used: SAMSUNG',
+            '# uncomment if you get no picture on HDMI for a default "safe" mode',
+            '#hdmi_safe=1',
+            'disable_overscan=1',
+            'overscan_left=16',
+            '#hdmi_group=1',
+            'hdmi_mode=4',
+            '[pi2]',
+            'arm_freq=900',
+            '[all]',
+            'config_hdmi_boost=4'
+        ])
+
+    def test_empty_file_untouched(self):
+        open(self.path, 'w').close()
+        self.config.invalidate()
+        self.config.set_value('hdmi_mode', 4)
+        self.assertEqual(self.read_lines(), [])
+
+
+class Comments(BootConfigTestCase):
+
+    def test_get_comment(self):
+        self.assertTrue(self.config.get_comment('kano_screen_used', 'SAMSUNG'))
+        self.assertFalse(self.config.get_comment('kano_screen_used', 'LG'))
+
+    def test_set_comment(self):
+        self.config.set_comment('kano_screen_used', 'LG')
+        lines = self.read_lines()
+        self.assertEqual(lines[0], '### kano_screen_used: LG')
+        self.assertNotIn('### kano_screen_used: SAMSUNG', lines)
+        self.assertTrue(self.config.has_comment('kano_screen_used'))
+
+
+class Transaction(BootConfigTestCase):
+
+    def test_staged_until_commit(self):
+        with self.config.transaction():
+            self.config.set_value('hdmi_mode', 4)
+            self.config.set_comment('kano_screen_used', 'LG')
+            self.assertIn('hdmi_mode=16', self.read_lines())
+            self.assertEqual(self.config.get_value('hdmi_mode'), 4)
+
+        lines = self.read_lines()
+        self.assertIn('hdmi_mode=4', lines)
+        self.assertEqual(lines[0], '### kano_screen_used: LG')
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_rollback_on_error(self):
+        try:
+            with self.config.transaction():
+                self.config.set_value('hdmi_mode', 4)
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertIn('hdmi_mode=16', self.read_lines())
+        self.assertEqual(self.config.get_value('hdmi_mode'), 16)
+
+    def test_commit_after_external_change(self):
+        with self.config.transaction():
+            self.config.set_value('hdmi_mode', 4)
+            with open(self.path, 'a') as config_file:
+                config_file.write('#external edit\n')
+
+        self.assertIn('hdmi_mode=4', self.read_lines())
+        self.assertEqual(self.config.get_value('hdmi_mode'), 4)
+
+
+class Cache(BootConfigTestCase):
+
+    def test_reload_after_external_change(self):
+        self.assertEqual(self.config.get_value('hdmi_mode'), 16)
+
+        # SAMPLE_CONFIG ends in the [pi2] section
+        with open(self.path, 'a') as config_file:
+            config_file.write('[all]\nhdmi_drive=2\n')
+
+        self.assertEqual(self.config.get_value('hdmi_drive'), 2)
+
+    def test_first_active_occurrence(self):
+        with open(self.path, 'a') as config_file:
+            config_file.write('[all]\nhdmi_mode=4\n')
+
+        self.assertEqual(self.config.get_value('hdmi_mode'), 16)
+
+    def test_own_write_notification_ignored(self):
+        self.config.set_value('hdmi_mode', 4)
+        document = self.config.document()
+
+        self.config.changed_on_disk()
+        self.assertIs(self.config.document(), document)
+
+    def test_external_write_notification(self):
+        self.config.get_value('hdmi_mode')
+        with open(self.path, 'a') as config_file:
+            config_file.write('[all]\nhdmi_drive=2\n')
+
+        self.config.changed_on_disk()
+        self.assertEqual(self.config.get_value('hdmi_drive'), 2)
+
+
+class Sections(BootConfigTestCase):
+
+    def test_section_overrides_unconditional(self):
+        self.config.set_value('arm_freq', 700)
+        self.assertEqual(self.config.get_value('arm_freq'), 700)
+        self.assertEqual(self.config.get_value('arm_freq', 'pi2'), 900)
+        self.assertEqual(self.config.get_value('arm_freq', 'pi1'), 700)
+
+    def test_set_in_existing_section(self):
+        self.config.set_value('core_freq', 250, 'pi2')
+        self.assertEqual(self.read_lines()[-2:], ['arm_freq=900', 'core_freq=250'])
+        self.assertFalse(self.config.has_value('core_freq'))
+
+    def test_set_in_new_section(self):
+        self.config.set_values([('arm_freq', 950)], 'pi1')
+        self.assertEqual(self.read_lines()[-3:], ['[pi1]', 'arm_freq=950', '[all]'])
+        self.assertEqual(self.config.get_value('arm_freq', 'pi1'), 950)
+        self.assertEqual(self.config.get_value('arm_freq', 'pi2'), 900)
+
+    def test_unconditional_leaves_sections(self):
+        self.config.set_value('arm_freq', None)
+        self.assertIn('arm_freq=900', self.read_lines())
@@ -0,0 +1,59 @@
+#
+# test_line_matcher.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the shared config line matching helpers
+#
+
+
+import unittest
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.line_matcher import compile_pattern, match_option, \
+    match_section, replace_lines
+
+
+class CompilePattern(unittest.TestCase):
+
+    def test_reuses_compiled(self):
+        self.assertIs(compile_pattern(r'a+b'), compile_pattern(r'a+b'))
+
+
+class MatchLines(unittest.TestCase):
+
+    def test_option(self):
+        self.assertEqual(match_option('hdmi_mode=16'),
+                         (False, 'hdmi_mode', '16'))
+
+    def test_commented_option(self):
+        self.assertEqual(match_option('# hdmi_mode=16'),
+                         (True, 'hdmi_mode', '16'))
+
+    def test_not_an_option(self):
+        self.assertIsNone(match_option('# uncomment to force a mode'))
+        self.assertIsNone(match_option('### kano_screen_used: LG'))
+
+    def test_section(self):
+        self.assertEqual(match_section('[pi2]'), 'pi2')
+        self.assertIsNone(match_section('arm_freq=900'))
+
+
+class ReplaceLines(unittest.TestCase):
+
+    def test_single_pass(self):
+        lines, count = replace_lines(
+            ['Bariol 14\n', 'other\n', 'Bariol 10\n'], r'Bariol [0-9]+',
+            'Bariol 18')
+        self.assertEqual(lines, ['Bariol 18\n', 'other\n', 'Bariol 18\n'])
+        self.assertEqual(count, 2)
+
+    def test_no_match(self):
+        lines, count = replace_lines(['other\n'], r'Bariol [0-9]+', 'x')
+        self.assertEqual(lines, ['other\n'])
+        self.assertEqual(count, 0)
@@ -0,0 +1,198 @@
+#
+# test_display_probe.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests how the display tools and sysfs are queried
+#
+
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import kano_settings.system.display as display
+
+
+class SysfsEdid(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_glob = display.drm_edid_glob
+        self.old_tvservice = display.tvservice_path
+        display.drm_edid_glob = os.path.join(
+            self.tmp_dir, 'card*-HDMI-A-*', 'edid')
+        # Fail loudly if the probe falls back to the firmware tool
+        display.tvservice_path = '/bin/false'
+        self.probe = display.DisplayProbe()
+
+    def tearDown(self):
+        display.drm_edid_glob = self.old_glob
+        display.tvservice_path = self.old_tvservice
+        shutil.rmtree(self.tmp_dir)
+
+    def write_edid(self, connector, data):
+        directory = os.path.join(self.tmp_dir, connector)
+        os.mkdir(directory)
+        path = os.path.join(directory, 'edid')
+        with open(path, 'wb') as edid_file:
+            edid_file.write(data)
+        return path
+
+    def test_connected_connector(self):
+        self.write_edid('card0-HDMI-A-1', '')
+        path = self.write_edid('card0-HDMI-A-2', '\x00\xff' * 64)
+
+        self.assertEqual(self.probe.edid_path(), path)
+        self.assertEqual(self.probe.edid_bytes(), '\x00\xff' * 64)
+
+    @unittest.skipUnless(os.path.exists('/proc/version'), 'needs procfs')
+    def test_zero_size_attribute(self):
+        # Like sysfs attributes, /proc files report a size of 0
+        directory = os.path.join(self.tmp_dir, 'card0-HDMI-A-1')
+        os.mkdir(directory)
+        path = os.path.join(directory, 'edid')
+        os.symlink('/proc/version', path)
+
+        with open('/proc/version', 'rb') as proc_file:
+            expected = proc_file.read()
+
+        self.assertEqual(self.probe.edid_path(), path)
+        self.assertEqual(self.probe.edid_bytes(), expected)
+
+    def test_nothing_connected(self):
+        self.write_edid('card0-HDMI-A-1', '')
+
+        self.assertIsNone(self.probe.edid_path())
+        self.assertIsNone(self.probe.edid_bytes())
+
+
+class ModeSwitch(unittest.TestCase):
+
+    STATUS = ('state 0x12000a [HDMI DMT (82) RGB full 16:9], '
+              '1920x1080 @ 60.00Hz, progressive\n')
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_tvservice = display.tvservice_path
+        display.tvservice_path = os.path.join(self.tmp_dir, 'tvservice')
+        with open(display.tvservice_path, 'w') as script:
+            script.write("#!/bin/sh\nprintf '{}'\n".format(self.STATUS))
+        os.chmod(display.tvservice_path, 0755)
+
+    def tearDown(self):
+        display.tvservice_path = self.old_tvservice
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_status(self):
+        self.assertEqual(display.parse_status_mode(self.STATUS), ('DMT', 82))
+        self.assertEqual(display.parse_status_mode(
+            'state 0x12000a [HDMI CEA (16) RGB lim 16:9], '
+            '1920x1080 @ 60.00Hz, progressive'), ('CEA', 16))
+        self.assertIsNone(display.parse_status_mode(
+            'state 0x40001 [NTSC 4:3], 720x480 @ 60.00Hz, interlaced'))
+
+    def test_lowercase_group(self):
+        self.assertTrue(display.wait_for_mode('dmt', 82, timeout=0.5))
+        self.assertTrue(display.wait_for_mode('DMT', '82', timeout=0.5))
+
+    def test_other_mode_times_out(self):
+        self.assertFalse(display.wait_for_mode('dmt', 8, timeout=0.1))
+        self.assertFalse(display.wait_for_mode('cea', 82, timeout=0.1))
+
+
+class DisplayKey(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_glob = display.drm_edid_glob
+        self.old_tvservice = display.tvservice_path
+        self.old_boot_id = display.boot_id_path
+        self.old_probe = display.display_probe
+        display.drm_edid_glob = os.path.join(
+            self.tmp_dir, 'card*-HDMI-A-*', 'edid')
+        display.tvservice_path = '/bin/false'
+        display.boot_id_path = os.path.join(self.tmp_dir, 'boot_id')
+        display.display_probe = display.DisplayProbe()
+
+        with open(display.boot_id_path, 'w') as boot_id:
+            boot_id.write('4a1c5b1e\n')
+        os.mkdir(os.path.join(self.tmp_dir, 'card0-HDMI-A-1'))
+        self.edid_path = os.path.join(self.tmp_dir, 'card0-HDMI-A-1', 'edid')
+
+    def tearDown(self):
+        display.drm_edid_glob = self.old_glob
+        display.tvservice_path = self.old_tvservice
+        display.boot_id_path = self.old_boot_id
+        display.display_probe = self.old_probe
+        shutil.rmtree(self.tmp_dir)
+
+    def plug(self, data):
+        with open(self.edid_path, 'wb') as edid_file:
+            edid_file.write(data)
+
+    def test_same_display(self):
+        self.plug('\x00\xff' * 64)
+        self.assertEqual(display.get_display_key(), display.get_display_key())
+
+    def test_hotplug(self):
+        self.plug('\x00\xff' * 64)
+        first_key = display.get_display_key()
+        display.display_probe.model()
+
+        self.plug('\x00\xfe' * 64)
+        self.assertNotEqual(display.get_display_key(), first_key)
+        self.assertEqual(display.display_probe.edid_bytes(), '\x00\xfe' * 64)
+        self.assertNotIn('model', display.display_probe._results)
+
+    def test_unplugged(self):
+        self.plug('\x00\xff' * 64)
+        first_key = display.get_display_key()
+
+        self.plug('')
+        self.assertNotEqual(display.get_display_key(), first_key)
+        self.assertIsNone(display.display_probe.edid_bytes())
+
+
+class Catalog(unittest.TestCase):
+
+    MODES = {
+        'CEA': {
+            4: ['1280x720', '60Hz', '16:9'],
+            16: ['1920x1080', '60Hz', '16:9']
+        },
+        'DMT': {
+            16: ['1024x768', '60Hz', '4:3'],
+            82: ['1920x1080', '60Hz', '16:9']
+        }
+    }
+
+    def setUp(self):
+        self.catalog = display.ModeCatalog(self.MODES, 'key')
+
+    def test_json_round_trip(self):
+        catalog = display.ModeCatalog.from_json(self.catalog.to_json())
+
+        self.assertEqual(catalog.key, 'key')
+        self.assertEqual(catalog.modes, self.MODES)
+        self.assertEqual(sorted(catalog.modes['DMT']), [16, 82])
+        self.assertEqual(catalog.as_list(), self.catalog.as_list())
+
+    def test_find(self):
+        self.assertEqual(self.catalog.as_list()[0],
+                         'cea:4  1280x720  60Hz  16:9')
+        self.assertEqual(self.catalog.find('cea', 4), 1)
+        self.assertEqual(self.catalog.find('CEA', '16'), 2)
+        self.assertEqual(self.catalog.find('dmt', 82), 4)
+        self.assertEqual(self.catalog.find('dmt', 4), 0)
+
+    def test_find_resolution(self):
+        self.assertEqual(self.catalog.find_resolution('1920x1080'),
+                         [('cea', 16), ('dmt', 82)])
+        self.assertEqual(self.catalog.find_resolution('800x600'), [])
@@ -0,0 +1,74 @@
+#
+# test_display_rules.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the display autoconfig rules against recorded screens
+#
+
+
+import unittest
+import json
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.system.display_rules import DisplayRules, get_rules_path
+
+
+fixtures_dir = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(fixtures_dir, name + '.json')) as f:
+        return json.load(f)
+
+
+def decide(rules, screen):
+    targets = rules.targets(screen['edid'], screen['model'],
+                            screen.get('edid_id'))
+    return rules.changes(screen['status'], targets)
+
+
+class Changes(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = DisplayRules.load(get_rules_path())
+
+    def test_configured_screen(self):
+        changes, reasons = decide(self.rules, load_fixture('lg-tv'))
+        self.assertEqual(changes, {})
+        self.assertEqual(reasons, [])
+
+    def test_all_changes_at_once(self):
+        changes, _ = decide(self.rules, load_fixture('benq-monitor'))
+        self.assertEqual(changes.items(), [
+            ('hdmi_group', 1),
+            ('hdmi_mode', 16),
+            ('hdmi_pixel_encoding', 2),
+            ('disable_overscan', 1),
+            ('overscan_left', 0),
+            ('overscan_right', 0),
+            ('overscan_top', 0),
+            ('overscan_bottom', 0),
+        ])
+
+    def test_model_override(self):
+        changes, _ = decide(self.rules, load_fixture('blackmagic'))
+        self.assertEqual(changes['hdmi_mode'], 33)
+        self.assertEqual(changes['hdmi_pixel_encoding'], 2)
+
+    def test_product_override(self):
+        rules = DisplayRules(products={
+            'GSM5B09': {'target_group': 'DMT', 'target_mode': 82}
+        })
+        changes, _ = decide(rules, load_fixture('lg-tv'))
+        self.assertEqual(changes.items(),
+                         [('hdmi_group', 2), ('hdmi_mode', 82)])
+
+    def test_missing_rules_file(self):
+        rules = DisplayRules.load('/nonexistent/display-rules.json')
+        self.assertIsNone(rules.find_override('BMD_HDMI'))
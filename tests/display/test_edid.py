@@ -0,0 +1,198 @@
+#
+# test_edid.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the native EDID decoder
+#
+
+
+import unittest
+import random
+import struct
+import glob
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.system.edid import decode_edid
+from kano_settings.system.display import parse_edid
+
+
+# Raw EDIDs as hex dumps, each next to the edidparser output for it
+edid_fixtures_dir = os.path.join(os.path.dirname(__file__), 'fixtures',
+                                 'edid')
+
+
+def read_edid_fixture(name):
+    with open(os.path.join(edid_fixtures_dir, name + '.hex')) as hex_file:
+        edid_bytes = ''.join(hex_file.read().split()).decode('hex')
+    with open(os.path.join(edid_fixtures_dir, name + '.txt')) as txt_file:
+        edid_txt = txt_file.read().splitlines()
+    return edid_bytes, edid_txt
+
+
+def detailed_timing(pixel_clock, width, hblank, height, vblank,
+                    interlaced=False):
+    return struct.pack(
+        '<H6B4x3B2xB', pixel_clock / 10000,
+        width & 0xff, hblank & 0xff, (width >> 8) << 4 | hblank >> 8,
+        height & 0xff, vblank & 0xff, (height >> 8) << 4 | vblank >> 8,
+        0, 0, 0, 0x80 if interlaced else 0x18)
+
+
+def monitor_name(name):
+    return '\x00\x00\x00\xfc\x00' + (name + '\n').ljust(13)[:13]
+
+
+def with_checksum(block):
+    block = block.ljust(127, '\x00')
+    return block + chr(-sum(ord(c) for c in block) % 256)
+
+
+def base_block(descriptors, width_cm, extensions=0, established=0,
+               standard=()):
+    standard = ''.join(standard).ljust(16, '\x01')
+    descriptors = ''.join(descriptors).ljust(72, '\x00')
+    block = '\x00\xff\xff\xff\xff\xff\xff\x00' + '\x00' * 10 + '\x01\x03' + \
+        '\x80' + chr(width_cm) + chr(width_cm * 9 / 16) + '\x00' * 12 + \
+        struct.pack('>H', established) + '\x00' + standard + \
+        descriptors + chr(extensions)
+    return with_checksum(block)
+
+
+def cea_block(vics, audio=True, timings=()):
+    data_blocks = chr(2 << 5 | len(vics)) + ''.join(chr(v) for v in vics)
+    if audio:
+        data_blocks += chr(1 << 5 | 3) + '\x09\x07\x07'
+    block = '\x02\x03' + chr(4 + len(data_blocks)) + \
+        chr(0x40 if audio else 0) + data_blocks + ''.join(timings)
+    return with_checksum(block)
+
+
+TIMING_1080P60 = detailed_timing(148500000, 1920, 280, 1080, 45)
+TIMING_1024P60 = detailed_timing(108000000, 1280, 408, 1024, 42)
+TIMING_2160P30 = detailed_timing(297000000, 3840, 560, 2160, 90)
+
+TV = base_block([TIMING_1080P60, monitor_name('LG TV')], 102, 1) + \
+    cea_block([16, 4, 31])
+DVI_MONITOR = base_block([TIMING_1024P60, monitor_name('DELL 1908FP')],
+                         38, established=0x0008)
+HDMI_MONITOR = base_block([TIMING_1080P60, monitor_name('BenQ GL2250')],
+                          48, 1, standard=['\xd1\xc0']) + \
+    cea_block([16, 4], audio=False)
+UHD_TV = base_block([TIMING_2160P30, monitor_name('SONY TV')], 140, 1) + \
+    cea_block([95, 16, 4])
+
+CORPUS = [TV, DVI_MONITOR, HDMI_MONITOR, UHD_TV]
+
+
+class Decode(unittest.TestCase):
+
+    def test_hdmi_tv(self):
+        self.assertEqual(decode_edid(TV), {
+            'dmt_found': False,
+            'hdmi_audio': True,
+            'screen_size': 102,
+            'model': u'LG TV',
+            'preferred_group': 'CEA',
+            'preferred_mode': 16,
+            'preferred_res': '1920x1080p',
+            'preferred_hz': 60.0,
+            'target_group': 'CEA',
+            'target_mode': 16,
+            'is_monitor': False,
+            'target_overscan': False,
+        })
+
+    def test_dvi_monitor(self):
+        edid = decode_edid(DVI_MONITOR)
+        self.assertEqual(edid['preferred_group'], 'DMT')
+        self.assertEqual(edid['preferred_mode'], 35)
+        self.assertEqual(edid['preferred_res'], '1280x1024p')
+        self.assertEqual(edid['model'], u'DELL 1908FP')
+        self.assertFalse(edid['hdmi_audio'])
+        self.assertTrue(edid['is_monitor'])
+
+    def test_hdmi_monitor_with_dmt_mode(self):
+        edid = decode_edid(HDMI_MONITOR)
+        self.assertEqual(edid['target_group'], 'CEA')
+        self.assertTrue(edid['dmt_found'])
+        self.assertTrue(edid['is_monitor'])
+        self.assertFalse(edid['hdmi_audio'])
+
+    def test_falls_back_from_unsupported_mode(self):
+        edid = decode_edid(UHD_TV)
+        self.assertEqual(edid['preferred_mode'], 95)
+        self.assertEqual((edid['found_group'], edid['found_mode']),
+                         ('CEA', 16))
+        self.assertEqual((edid['target_group'], edid['target_mode']),
+                         ('CEA', 16))
+
+    def test_rejects_invalid(self):
+        self.assertIsNone(decode_edid(None))
+        self.assertIsNone(decode_edid(TV[:100]))
+        self.assertIsNone(decode_edid('\x00' * 128))
+
+        corrupted = TV[:20] + chr(ord(TV[20]) ^ 0xff) + TV[21:]
+        self.assertIsNone(decode_edid(corrupted))
+
+
+class MatchesEdidparser(unittest.TestCase):
+
+    def fixture_names(self):
+        return sorted(
+            os.path.splitext(os.path.basename(path))[0]
+            for path in glob.glob(os.path.join(edid_fixtures_dir, '*.hex'))
+        )
+
+    def test_fixtures(self):
+        names = self.fixture_names()
+        self.assertTrue(names)
+
+        for name in names:
+            edid_bytes, edid_txt = read_edid_fixture(name)
+            self.assertIn(len(edid_bytes), (128, 256))
+            self.assertEqual(decode_edid(edid_bytes), parse_edid(edid_txt),
+                             name)
+
+    def test_fractional_refresh_rate(self):
+        edid_bytes, _ = read_edid_fixture('hdmi-tv-59.94hz')
+        edid = decode_edid(edid_bytes)
+
+        self.assertEqual(edid['preferred_hz'], 59.94)
+        self.assertEqual(edid['preferred_mode'], 16)
+        # the DMT 1920x1080 mode is listed at 60 Hz, not at 59.94
+        self.assertFalse(edid['dmt_found'])
+
+
+class Fuzz(unittest.TestCase):
+
+    def check(self, data):
+        edid = decode_edid(data)
+        if edid is not None:
+            self.assertIn(edid['target_group'], ('CEA', 'DMT'))
+            self.assertIsInstance(edid['target_mode'], int)
+
+    def test_random_bytes(self):
+        rand = random.Random(0)
+        for sample in CORPUS:
+            for _ in xrange(200):
+                data = bytearray(sample)
+                for _ in xrange(rand.randint(1, 8)):
+                    data[rand.randrange(len(data))] = rand.randrange(256)
+
+                # most mutations should get past the checksums
+                for block in xrange(0, len(data), 128):
+                    data[block + 127] = 0
+                    data[block + 127] = -sum(data[block:block + 128]) % 256
+
+                self.check(str(data))
+
+    def test_truncated(self):
+        for sample in CORPUS:
+            for length in xrange(0, len(sample), 7):
+                self.check(sample[:length])
@@ -0,0 +1,63 @@
+#
+# test_screen_history.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the append-only screen history log
+#
+
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.system.screen_history import record_screen, \
+    append_record, make_record, read_records
+
+
+SCREEN = {'model': 'LG TV', 'edid_id': 'GSM5B09'}
+
+
+class History(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'screen.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_only_records_new_fingerprints(self):
+        self.assertTrue(record_screen(SCREEN, {'edid': 'a'}, self.path))
+        self.assertFalse(record_screen(SCREEN, {'edid': 'a'}, self.path))
+        self.assertTrue(record_screen(SCREEN, {'edid': 'b'}, self.path))
+
+        records = read_records(self.path)
+        self.assertEqual([r['fingerprint'] for r in records],
+                         [{'edid': 'a'}, {'edid': 'b'}])
+
+    def test_skips_old_log_format(self):
+        with open(self.path, 'w') as f:
+            f.write('{\n    "model": "LG TV"\n}\n')
+
+        record_screen(SCREEN, {'edid': 'a'}, self.path)
+        self.assertEqual(len(read_records(self.path)), 1)
+
+    def test_rotation_is_bounded(self):
+        for i in xrange(100):
+            append_record(make_record(SCREEN, {'n': i}), self.path,
+                          max_size=1024, rotations=2)
+
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)),
+                         ['screen.log', 'screen.log.1', 'screen.log.2'])
+        self.assertTrue(os.path.getsize(self.path) <= 1024)
+
+        numbers = [r['fingerprint']['n'] for r in read_records(self.path)]
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(numbers[-1], 99)
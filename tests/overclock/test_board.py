@@ -0,0 +1,112 @@
+#
+# test_board.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests board detection and the overclock profiles file
+#
+
+
+import unittest
+import tempfile
+import copy
+import json
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.system.board import normalise_revision, \
+    read_board_revision
+from kano_settings.system.overclock import ProfileRegistry, check_profiles, \
+    BUILTIN_PROFILES
+
+
+profiles_path = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', '..', 'overclock-profiles.json'))
+
+
+class Revision(unittest.TestCase):
+
+    def test_normalise(self):
+        self.assertEqual(normalise_revision('000e'), '000e')
+        self.assertEqual(normalise_revision('1000002'), '0002')
+        self.assertEqual(normalise_revision('A21041'), 'a21041')
+        self.assertEqual(normalise_revision('2a01041'), 'a01041')
+        self.assertIsNone(normalise_revision('garbage'))
+
+    def test_read_cpuinfo(self):
+        with tempfile.NamedTemporaryFile() as cpuinfo:
+            cpuinfo.write('Hardware\t: BCM2709\nRevision\t: a21041\n')
+            cpuinfo.flush()
+            self.assertEqual(read_board_revision(cpuinfo.name), 'a21041')
+
+
+class Profiles(unittest.TestCase):
+
+    def test_known_revisions_have_profiles(self):
+        with open(profiles_path) as f:
+            profiles = json.load(f)
+
+        for revision, board in profiles['revisions'].iteritems():
+            self.assertEqual(normalise_revision(revision), revision)
+            self.assertIn(board, profiles['boards'])
+
+        for board in profiles['boards'].itervalues():
+            self.assertIn(board['default'], board['modes'])
+            self.assertEqual(sorted(board['modes']), sorted(board['values']))
+
+    def test_shipped_profiles_valid(self):
+        with open(profiles_path) as f:
+            check_profiles(json.load(f))
+        check_profiles(BUILTIN_PROFILES)
+
+
+class Registry(unittest.TestCase):
+
+    def profiles(self):
+        return copy.deepcopy(BUILTIN_PROFILES)
+
+    def test_new_board(self):
+        data = self.profiles()
+        data['boards']['pi3'] = copy.deepcopy(data['boards']['pi2'])
+        data['boards']['pi3']['section'] = 'pi3'
+        data['boards']['pi3']['values']['Standard']['arm_freq'] = 1200
+        data['revisions'] = {'a02082': 'pi3'}
+
+        registry = ProfileRegistry(data)
+        values = data['boards']['pi3']['values']['Standard']
+        self.assertEqual(registry.board_for_revision('a02082'), 'pi3')
+        self.assertEqual(registry.find_mode('pi3', values), 'Standard')
+        self.assertIsNone(registry.find_mode('pi2', values))
+
+    def test_rejects_non_integer_values(self):
+        for value in ['1000\n[all]\nover_voltage=8', '1000', 1000.5, True,
+                      None, [1000]]:
+            data = self.profiles()
+            data['boards']['pi2']['values']['Overclocked']['arm_freq'] = value
+            self.assertRaises(ValueError, ProfileRegistry, data)
+
+    def test_rejects_invalid_section(self):
+        for section in ['pi2]\nover_voltage=8\n[pi2', '', 2, None]:
+            data = self.profiles()
+            data['boards']['pi2']['section'] = section
+            self.assertRaises(ValueError, ProfileRegistry, data)
+
+    def test_rejects_inconsistent_modes(self):
+        data = self.profiles()
+        data['boards']['pi2']['default'] = 'Turbo'
+        self.assertRaises(ValueError, ProfileRegistry, data)
+
+        data = self.profiles()
+        del data['boards']['pi2']['values']['Standard']['over_voltage']
+        self.assertRaises(ValueError, ProfileRegistry, data)
+
+        data = self.profiles()
+        data['revisions'] = {'a02082': 'pi3'}
+        self.assertRaises(ValueError, ProfileRegistry, data)
+
+        self.assertRaises(ValueError, ProfileRegistry, [])
+        self.assertRaises(ValueError, ProfileRegistry, {'boards': []})
@@ -0,0 +1,102 @@
+#
+# test_clock_migration.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests moving flat clock values into per-chip sections
+#
+
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import kano_settings.boot_config as boot_config
+import kano_settings.system.overclock_chip_support as chip_support
+from kano_settings.boot_config import BootConfig
+from kano_settings.system import overclock
+
+
+PI1_HIGH = {'arm_freq': 950, 'core_freq': 250, 'sdram_freq': 450, 'over_voltage': 6}
+PI2_STANDARD = {'arm_freq': 900, 'core_freq': 250, 'sdram_freq': 450, 'over_voltage': 0}
+PI2_OVERCLOCKED = {'arm_freq': 1000, 'core_freq': 500, 'sdram_freq': 500, 'over_voltage': 2}
+
+
+def config_text(values):
+    return ''.join('{}={}\n'.format(key, values[key])
+                   for key in overclock.CLOCK_KEYS)
+
+
+class MigrationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'config.txt')
+
+        self.old_configs = (boot_config.real_config,
+                            chip_support.pi1_backup_config,
+                            chip_support.pi2_backup_config)
+        boot_config.real_config = BootConfig(self.path)
+        chip_support.pi1_backup_config = BootConfig(
+            os.path.join(self.tmp_dir, 'config_pi1_backup.txt'))
+        chip_support.pi2_backup_config = BootConfig(
+            os.path.join(self.tmp_dir, 'config_pi2_backup.txt'))
+
+    def tearDown(self):
+        (boot_config.real_config,
+         chip_support.pi1_backup_config,
+         chip_support.pi2_backup_config) = self.old_configs
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, text):
+        with open(os.path.join(self.tmp_dir, name), 'w') as config_file:
+            config_file.write(text)
+
+    def read(self):
+        with open(self.path) as config_file:
+            return config_file.read()
+
+    def section_values(self, section):
+        return BootConfig(self.path).get_values(overclock.CLOCK_KEYS, section)
+
+
+class Migrate(MigrationTestCase):
+
+    def test_flat_values_valid_for_chip(self):
+        self.write('config.txt', 'disable_overscan=1\n' + config_text(PI1_HIGH))
+
+        self.assertFalse(chip_support.check_clock_config_matches_chip('pi1'))
+        self.assertEqual(self.section_values('pi1'), PI1_HIGH)
+        self.assertEqual(self.section_values('pi2'), PI2_STANDARD)
+        self.assertFalse(BootConfig(self.path).has_value('arm_freq'))
+
+    def test_flat_values_for_other_chip(self):
+        self.write('config.txt', config_text(PI1_HIGH))
+        self.write('config_pi2_backup.txt', config_text(PI2_OVERCLOCKED))
+
+        self.assertTrue(chip_support.check_clock_config_matches_chip('pi2'))
+        self.assertEqual(self.section_values('pi2'), PI2_OVERCLOCKED)
+        self.assertEqual(self.section_values('pi1'), PI1_HIGH)
+
+    def test_no_usable_values(self):
+        self.write('config.txt', 'disable_overscan=1\narm_freq=1234\n')
+
+        self.assertTrue(chip_support.check_clock_config_matches_chip('pi2'))
+        self.assertEqual(self.section_values('pi1'), PI1_HIGH)
+        self.assertEqual(self.section_values('pi2'), PI2_STANDARD)
+
+    def test_sections_present(self):
+        text = ('disable_overscan=1\n[pi1]\n' + config_text(PI1_HIGH) +
+                '[pi2]\n' + config_text(PI2_STANDARD) + '[all]\n')
+        self.write('config.txt', text)
+        self.write('config_pi2_backup.txt', config_text(PI2_OVERCLOCKED))
+
+        self.assertFalse(chip_support.check_clock_config_matches_chip('pi2'))
+        self.assertFalse(chip_support.check_clock_config_matches_chip('pi1'))
+        self.assertEqual(self.read(), text)
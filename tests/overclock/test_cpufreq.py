@@ -0,0 +1,151 @@
+#
+# test_cpufreq.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the cpufreq governor control against a stub sysfs tree
+#
+
+
+import unittest
+import tempfile
+import shutil
+import json
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.config_file import settings_store
+from kano_settings.system.cpufreq import get_governor, \
+    get_available_governors, apply_governor, save_governor, \
+    get_saved_governor, apply_saved_governor, ONDEMAND_UP_THRESHOLD
+
+
+class StubCpufreq(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        for cpu in ['cpu0', 'cpu1']:
+            self.write(cpu, 'scaling_governor', 'powersave')
+            self.write(cpu, 'scaling_available_governors',
+                       'conservative ondemand userspace powersave performance')
+            self.write(cpu, 'cpuinfo_min_freq', '600000')
+            self.write(cpu, 'cpuinfo_max_freq', '900000')
+            self.write(cpu, 'scaling_min_freq', '600000')
+            self.write(cpu, 'scaling_max_freq', '600000')
+        os.makedirs(os.path.join(self.base, 'cpuidle'))
+        self.write('cpufreq/ondemand', 'up_threshold', '95')
+        self.settings_path = os.path.join(self.base, 'settings')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def path(self, cpu, name):
+        if not cpu.startswith('cpufreq'):
+            cpu = os.path.join(cpu, 'cpufreq')
+        return os.path.join(self.base, cpu, name)
+
+    def write(self, cpu, name, value):
+        path = self.path(cpu, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(value + '\n')
+
+    def read(self, cpu, name):
+        with open(self.path(cpu, name)) as f:
+            return f.read().strip()
+
+    def save_settings(self, settings):
+        with open(self.settings_path, 'w') as f:
+            json.dump(settings, f)
+
+
+class Governors(StubCpufreq):
+
+    def test_available(self):
+        self.assertEqual(get_available_governors(self.base),
+                         ['ondemand', 'performance', 'powersave'])
+        self.assertEqual(get_governor(self.base), 'powersave')
+
+    def test_no_cpufreq(self):
+        empty = os.path.join(self.base, 'cpuidle')
+        self.assertEqual(get_available_governors(empty), [])
+        self.assertIsNone(get_governor(empty))
+        self.assertFalse(apply_governor('ondemand', empty))
+
+    def test_apply_every_core(self):
+        self.assertTrue(apply_governor('performance', self.base))
+        for cpu in ['cpu0', 'cpu1']:
+            self.assertEqual(self.read(cpu, 'scaling_governor'), 'performance')
+            self.assertEqual(self.read(cpu, 'scaling_max_freq'), '900000')
+            self.assertEqual(self.read(cpu, 'scaling_min_freq'), '600000')
+
+    def test_powersave_pinned_to_minimum(self):
+        self.assertTrue(apply_governor('powersave', self.base))
+        self.assertEqual(self.read('cpu1', 'scaling_max_freq'), '600000')
+
+    def test_ondemand_threshold(self):
+        self.assertTrue(apply_governor('ondemand', self.base))
+        self.assertEqual(self.read('cpufreq/ondemand', 'up_threshold'),
+                         str(ONDEMAND_UP_THRESHOLD))
+
+    def test_reject_invalid(self):
+        self.assertFalse(apply_governor('turbo', self.base))
+        self.assertFalse(apply_governor('userspace', self.base))
+        self.assertEqual(get_governor(self.base), 'powersave')
+
+    def test_reject_unavailable(self):
+        self.write('cpu0', 'scaling_available_governors', 'ondemand powersave')
+        self.assertFalse(apply_governor('performance', self.base))
+        self.assertEqual(get_governor(self.base), 'powersave')
+
+
+class RestoreOnBoot(StubCpufreq):
+
+    def test_not_saved_for_root(self):
+        settings_store.username = lambda: 'root'
+        try:
+            self.assertTrue(apply_governor('performance', self.base))
+            self.assertFalse(save_governor('performance'))
+        finally:
+            del settings_store.username
+
+        # Still applied, only not kept for the next boot
+        self.assertEqual(get_governor(self.base), 'performance')
+
+    def test_saved_governor(self):
+        self.save_settings({'CPU-governor': 'performance'})
+        self.assertEqual(get_saved_governor(self.settings_path), 'performance')
+
+        self.assertTrue(apply_saved_governor(self.base, self.settings_path))
+        self.assertEqual(get_governor(self.base), 'performance')
+
+    def test_default_governor(self):
+        self.assertEqual(get_saved_governor(self.settings_path), 'ondemand')
+
+        self.assertTrue(apply_saved_governor(self.base, self.settings_path))
+        self.assertEqual(get_governor(self.base), 'ondemand')
+
+    def test_invalid_saved_governor(self):
+        self.save_settings({'CPU-governor': 'turbo'})
+        self.assertEqual(get_saved_governor(self.settings_path), 'ondemand')
+
+    def test_unavailable_falls_back_to_ondemand(self):
+        self.save_settings({'CPU-governor': 'performance'})
+        for cpu in ['cpu0', 'cpu1']:
+            self.write(cpu, 'scaling_available_governors', 'ondemand powersave')
+
+        self.assertTrue(apply_saved_governor(self.base, self.settings_path))
+        self.assertEqual(get_governor(self.base), 'ondemand')
+
+    def test_nothing_available(self):
+        self.save_settings({'CPU-governor': 'performance'})
+        for cpu in ['cpu0', 'cpu1']:
+            self.write(cpu, 'scaling_available_governors', 'powersave')
+
+        # rc.overclock falls back to the shell version
+        self.assertFalse(apply_saved_governor(self.base, self.settings_path))
@@ -0,0 +1,94 @@
+#
+# test_overclock_bench.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the overclock benchmark against stub sysfs files
+#
+
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.system.overclock_bench import SysfsPaths, ResultsStore, \
+    run_benchmark, validate_run, recommend_mode, read_temperature, \
+    read_cpu_freq
+
+
+class StubSysfs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.paths = SysfsPaths(
+            temperature=os.path.join(self.tmp_dir, 'temp'),
+            throttled=os.path.join(self.tmp_dir, 'get_throttled'),
+            cpu_freq=os.path.join(self.tmp_dir, 'scaling_cur_freq')
+        )
+        self.write('temp', '45000')
+        self.write('get_throttled', '0')
+        self.write('scaling_cur_freq', '1000000')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, value):
+        with open(os.path.join(self.tmp_dir, name), 'w') as f:
+            f.write(value + '\n')
+
+
+class Readings(StubSysfs):
+
+    def test_readings(self):
+        self.assertEqual(read_temperature(self.paths), 45.0)
+        self.assertEqual(read_cpu_freq(self.paths), 1000)
+
+
+class Benchmark(StubSysfs):
+
+    def run_with(self, temperature, throttled):
+        def workload(duration):
+            # the board heats up and throttles while the workload runs
+            self.write('temp', temperature)
+            self.write('get_throttled', throttled)
+            return 42.0
+
+        return run_benchmark(0, self.paths, workload, interval=0.01)
+
+    def test_stable(self):
+        result = self.run_with('60000', '0')
+        self.assertTrue(result['stable'])
+        self.assertEqual(result['score'], 42.0)
+        self.assertEqual(result['max_temperature'], 60.0)
+        self.assertEqual(result['cpu_freq'], 1000)
+
+    def test_throttled(self):
+        result = self.run_with('60000', '50005')
+        self.assertFalse(result['stable'])
+
+    def test_too_hot(self):
+        self.assertFalse(self.run_with('85000', '0')['stable'])
+
+    def test_ignores_throttling_before_the_run(self):
+        self.assertTrue(validate_run(1.0, [50.0], [0x50000, 0x50000])['stable'])
+
+
+class Recommendation(StubSysfs):
+
+    def test_fastest_stable_mode(self):
+        store = ResultsStore(os.path.join(self.tmp_dir, 'results.json'))
+        self.assertIsNone(recommend_mode('pi1', store))
+
+        store.record('pi1', 'High', {'score': 10, 'stable': True})
+        store.record('pi1', 'Turbo', {'score': 12, 'stable': False})
+        store.record('pi1', 'Medium', {'score': 9, 'stable': True})
+
+        reloaded = ResultsStore(store.path)
+        self.assertEqual(recommend_mode('pi1', reloaded), 'High')
+        self.assertIsNone(recommend_mode('pi2', reloaded))
@@ -0,0 +1,62 @@
+#
+# test_profiler.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the span profiler and its trace export
+#
+
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.profiler import Profiler, load_trace, to_chrome_trace
+
+
+class Spans(unittest.TestCase):
+
+    def test_disabled_records_nothing(self):
+        profiler = Profiler()
+        with profiler.span('probe'):
+            pass
+        self.assertEqual(profiler.spans, [])
+
+    def test_records_failed_spans(self):
+        profiler = Profiler()
+        profiler.enable()
+        with self.assertRaises(ValueError):
+            with profiler.span('probe'):
+                raise ValueError()
+        self.assertEqual([s[0] for s in profiler.spans], ['probe'])
+
+
+class Trace(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_chrome_trace(self):
+        profiler = Profiler()
+        profiler.enable()
+        with profiler.span('probe'):
+            with profiler.span('probe.edid'):
+                pass
+
+        path = os.path.join(self.tmp_dir, 'cache', 'trace.json')
+        profiler.save(path)
+
+        events = to_chrome_trace(load_trace(path))['traceEvents']
+        spans = [e for e in events if e['ph'] == 'X']
+        self.assertEqual(sorted(e['name'] for e in spans),
+                         ['probe', 'probe.edid'])
+        self.assertTrue(all(e['dur'] >= 0 for e in spans))
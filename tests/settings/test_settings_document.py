@@ -0,0 +1,158 @@
+#
+# test_settings_document.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests applying a provisioning document of settings and
+# config.txt options
+#
+
+
+import unittest
+import tempfile
+import shutil
+import json
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.boot_config import BootConfig
+from kano_settings.config_file import SettingsStore
+from kano_settings.settings_document import apply_document, \
+    check_boot_config
+
+
+CONFIG = '''disable_overscan=1
+hdmi_mode=16
+[pi2]
+arm_freq=900
+'''
+
+
+class StubSettingsStore(SettingsStore):
+
+    def __init__(self, path, username):
+        SettingsStore.__init__(self, path)
+        self._username = username
+
+
+class CheckBootConfig(unittest.TestCase):
+
+    def test_valid(self):
+        self.assertEqual(check_boot_config({
+            'hdmi_mode': 16,
+            'hdmi_drive': None,
+            'dtparam': 'audio=on',
+            'pi2': {'arm_freq': 1000}
+        }), {})
+
+    def test_invalid_names(self):
+        self.assertEqual(check_boot_config({
+            'hdmi mode': 16,
+            'hdmi_mode=4\nhdmi_group': 1,
+            '#hdmi_drive': 2,
+            'pi 2': {'arm_freq': 1000}
+        }), {
+            'hdmi mode': 'invalid option name',
+            'hdmi_mode=4\nhdmi_group': 'invalid option name',
+            '#hdmi_drive': 'invalid option name',
+            'pi 2': 'invalid section name'
+        })
+
+    def test_invalid_values(self):
+        rejected = check_boot_config({
+            'hdmi_mode': '16\nhdmi_safe=1',
+            'hdmi_drive': [2],
+            'hdmi_group': True,
+            'pi2': {'arm_freq': {'value': 1000}, 'core_freq': 250}
+        })
+
+        self.assertEqual(sorted(rejected), ['hdmi_drive', 'hdmi_group',
+                                            'hdmi_mode', 'pi2'])
+        self.assertEqual(rejected['hdmi_mode'], 'the value must fit on one line')
+        self.assertEqual(sorted(rejected['pi2']), ['arm_freq'])
+
+
+class ApplyDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmp_dir, 'config.txt')
+        with open(self.config_path, 'w') as config_file:
+            config_file.write(CONFIG)
+        self.settings_path = os.path.join(self.tmp_dir, 'settings')
+
+        self.config = BootConfig(self.config_path)
+        self.store = StubSettingsStore(self.settings_path, 'pi')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def apply(self, document, store=None):
+        return apply_document(document, self.config, store or self.store)
+
+    def read_config(self):
+        with open(self.config_path) as config_file:
+            return config_file.read()
+
+    def test_apply(self):
+        report = self.apply({
+            'settings': {'Font': 'Big', 'Parental-level': 2},
+            'boot_config': {
+                'hdmi_mode': 4,
+                'disable_overscan': None,
+                'pi2': {'arm_freq': 1000}
+            }
+        })
+
+        self.assertTrue(report['success'])
+        self.assertEqual(report['settings']['applied'],
+                         {'Font': 'Big', 'Parental-level': 2.0})
+        with open(self.settings_path) as settings_file:
+            self.assertEqual(json.load(settings_file),
+                             {'Font': 'Big', 'Parental-level': 2.0})
+
+        config = BootConfig(self.config_path)
+        self.assertEqual(config.get_value('hdmi_mode'), 4)
+        self.assertEqual(config.get_value('arm_freq', 'pi2'), 1000)
+        self.assertIn('#disable_overscan=0', self.read_config())
+
+    def test_wrong_shape(self):
+        for document in [[], 'settings', {'settings': []},
+                         {'boot_config': 16}]:
+            report = self.apply(document)
+            self.assertFalse(report['success'])
+            self.assertIn('error', report)
+
+        self.assertEqual(self.read_config(), CONFIG)
+
+    def test_nothing_written_on_rejection(self):
+        report = self.apply({
+            'settings': {'Font': 'Huge'},
+            'boot_config': {'hdmi_mode': 4}
+        })
+
+        self.assertFalse(report['success'])
+        self.assertEqual(list(report['settings']['rejected']), ['Font'])
+        self.assertEqual(report['boot_config']['applied'], {})
+        self.assertEqual(self.read_config(), CONFIG)
+        self.assertFalse(os.path.exists(self.settings_path))
+
+    def test_root_settings_rejected(self):
+        report = self.apply({'settings': {'Font': 'Big'}},
+                            StubSettingsStore(self.settings_path, 'root'))
+
+        self.assertFalse(report['success'])
+        self.assertEqual(list(report['settings']['rejected']), ['Font'])
+        self.assertEqual(report['settings']['applied'], {})
+
+    def test_empty_config_rejected(self):
+        open(self.config_path, 'w').close()
+        report = self.apply({'boot_config': {'hdmi_mode': 4}})
+
+        self.assertFalse(report['success'])
+        self.assertEqual(list(report['boot_config']['rejected']), ['hdmi_mode'])
+        self.assertEqual(self.read_config(), '')
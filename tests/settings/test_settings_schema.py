@@ -0,0 +1,60 @@
+#
+# test_settings_schema.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the typed loading of the settings file
+#
+
+
+import unittest
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.settings_schema import SCHEMA, get_defaults, \
+    decode_settings, encode_settings
+
+
+class Defaults(unittest.TestCase):
+
+    def test_board_defaults(self):
+        self.assertEqual(get_defaults('pi1')['Overclocking'], 'High')
+        self.assertEqual(get_defaults('pi2')['Overclocking'], 'Standard')
+        self.assertEqual(get_defaults('pi2')['Audio'], 'Analogue')
+
+
+class Validate(unittest.TestCase):
+
+    def test_coerce_number(self):
+        self.assertEqual(SCHEMA['Parental-level'].validate(3), 3.0)
+        self.assertIsInstance(SCHEMA['Parental-level'].validate(3), float)
+
+    def test_reject_wrong_type(self):
+        self.assertRaises(ValueError, SCHEMA['Wifi-connection-attempted'].validate, 1)
+        self.assertRaises(ValueError, SCHEMA['Keyboard-country-index'].validate, True)
+
+    def test_reject_choice(self):
+        self.assertRaises(ValueError, SCHEMA['Audio'].validate, 'Speakers')
+
+
+class Decode(unittest.TestCase):
+
+    def test_invalid_values_dropped(self):
+        settings = decode_settings(
+            '{"Audio": "Speakers", "Mouse": "Fast", "Proxy-ip": "1.2.3.4"}')
+        self.assertNotIn('Audio', settings)
+        self.assertEqual(settings['Mouse'], 'Fast')
+        self.assertEqual(settings['Proxy-ip'], '1.2.3.4')
+
+    def test_garbage(self):
+        self.assertEqual(decode_settings('{"Audio": '), {})
+
+    def test_round_trip(self):
+        data = {'Parental-level': 3.0, 'Font': 'Big'}
+        encoded = encode_settings(data)
+        self.assertNotIn(' ', encoded)
+        self.assertEqual(decode_settings(encoded), data)
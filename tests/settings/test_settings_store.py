@@ -0,0 +1,109 @@
+#
+# test_settings_store.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests the cached, batched settings file
+#
+
+
+import unittest
+import tempfile
+import shutil
+import json
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from kano_settings.config_file import SettingsStore
+
+
+class UserSettingsStore(SettingsStore):
+    # root's settings are never written, so pretend to be a user
+    def username(self):
+        return 'pi'
+
+
+class SettingsStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'settings')
+        self.write_file({'Font': 'Normal', 'Mouse': 'Normal'})
+        self.store = UserSettingsStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_file(self, data):
+        with open(self.path, 'w') as settings_file:
+            json.dump(data, settings_file)
+
+    def read_file(self):
+        with open(self.path) as settings_file:
+            return json.load(settings_file)
+
+
+class Batch(SettingsStoreTestCase):
+
+    def test_single_write(self):
+        with self.store.batch():
+            self.store.set_settings({'Font': 'Big'})
+            self.store.set_settings({'Mouse': 'Fast'})
+            self.assertEqual(self.read_file()['Font'], 'Normal')
+
+        self.assertEqual(self.read_file(), {'Font': 'Big', 'Mouse': 'Fast'})
+
+    def test_unchanged_not_written(self):
+        # Saving replaces the file, which would give it a new inode
+        inode = os.stat(self.path).st_ino
+        self.store.set_settings({'Font': 'Normal'})
+        self.assertEqual(os.stat(self.path).st_ino, inode)
+
+    def test_invalid_value_skipped(self):
+        self.store.set_settings({'Font': 'Huge', 'Mouse': 'Slow'})
+        self.assertEqual(self.read_file(), {'Font': 'Normal', 'Mouse': 'Slow'})
+
+    def test_rollback_on_error(self):
+        try:
+            with self.store.batch():
+                self.store.set_settings({'Font': 'Big'})
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual(self.read_file()['Font'], 'Normal')
+        self.assertEqual(self.store.get('Font'), 'Normal')
+
+    def test_external_change_during_batch(self):
+        with self.store.batch():
+            self.store.set_settings({'Font': 'Big'})
+            self.write_file({'Font': 'Normal', 'Mouse': 'Slow', 'Wifi': ''})
+
+        self.assertEqual(self.read_file()['Font'], 'Big')
+        self.assertEqual(self.store.get('Font'), 'Big')
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+
+class Cache(SettingsStoreTestCase):
+
+    def test_reload_after_external_change(self):
+        self.assertEqual(self.store.get('Font'), 'Normal')
+
+        self.write_file({'Font': 'Small', 'Mouse': 'Normal', 'Wifi': 'home'})
+        self.assertEqual(self.store.get('Font'), 'Small')
+        self.assertEqual(self.store.get('Wifi'), 'home')
+
+    def test_missing_variable(self):
+        self.assertRaises(KeyError, self.store.get, 'Wallpaper')
+
+
+    def test_own_write_notification_ignored(self):
+        self.store.set_settings({'Font': 'Big'})
+        data = self.store.data()
+
+        self.store.changed_on_disk()
+        self.assertIs(self.store.data(), data)
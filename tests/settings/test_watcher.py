@@ -0,0 +1,112 @@
+#
+# test_watcher.py
+#
+# Copyright (C) 2015 Kano Computing Ltd.
+# License: http://www.gnu.org/licenses/gpl-2.0.txt GNU General Public License v2
+#
+# This module tests how file change notifications are turned into events
+#
+
+
+import unittest
+import tempfile
+import shutil
+import json
+import sys
+import os
+
+sys.path.insert(1, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import kano_settings.watcher as watcher
+from kano_settings.config_file import SettingsStore
+
+
+class StubEvent(object):
+    """ The only part of a pyinotify event the watcher looks at """
+
+    def __init__(self, pathname):
+        self.pathname = pathname
+
+
+class Events(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.settings_path = os.path.join(self.tmp_dir, 'settings')
+        self.config_path = os.path.join(self.tmp_dir, 'config.txt')
+        self.write_settings({'Font': 'Normal', 'Mouse': 'Normal'})
+
+        self.old_store = watcher.settings_store
+        watcher.settings_store = SettingsStore(self.settings_path)
+
+        self.watcher = watcher.ChangeWatcher()
+        self.watcher.watch(self.settings_path, watcher.SETTINGS_CHANGED)
+        self.watcher.watch(self.config_path, watcher.BOOT_CONFIG_CHANGED)
+        self.watcher._settings_snapshot = self.watcher._read_settings()
+
+        self.events = []
+        for kind in [watcher.SETTINGS_CHANGED, watcher.BOOT_CONFIG_CHANGED]:
+            self.watcher.subscribe(kind, self.events.append)
+
+    def tearDown(self):
+        watcher.settings_store = self.old_store
+        shutil.rmtree(self.tmp_dir)
+
+    def write_settings(self, settings):
+        with open(self.settings_path, 'w') as settings_file:
+            json.dump(settings, settings_file)
+
+    def test_changed_keys(self):
+        self.write_settings({'Font': 'Big', 'Mouse': 'Normal', 'Wifi': ''})
+        self.watcher._on_event(StubEvent(self.settings_path))
+
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0].kind, watcher.SETTINGS_CHANGED)
+        self.assertEqual(self.events[0].changed_keys, ['Font', 'Wifi'])
+
+    def test_removed_key(self):
+        self.write_settings({'Font': 'Normal'})
+        self.watcher._on_event(StubEvent(self.settings_path))
+
+        self.assertEqual(self.events[0].changed_keys, ['Mouse'])
+
+    def test_unchanged_settings_not_published(self):
+        self.write_settings({'Mouse': 'Normal', 'Font': 'Normal'})
+        self.watcher._on_event(StubEvent(self.settings_path))
+
+        self.assertEqual(self.events, [])
+
+    def test_diff_against_previous_event(self):
+        self.write_settings({'Font': 'Big', 'Mouse': 'Normal'})
+        self.watcher._on_event(StubEvent(self.settings_path))
+        self.write_settings({'Font': 'Big', 'Mouse': 'Fast'})
+        self.watcher._on_event(StubEvent(self.settings_path))
+
+        self.assertEqual([e.changed_keys for e in self.events],
+                         [['Font'], ['Mouse']])
+
+    def test_boot_config(self):
+        self.watcher._on_event(StubEvent(self.config_path))
+
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0].kind, watcher.BOOT_CONFIG_CHANGED)
+        self.assertEqual(self.events[0].path, self.config_path)
+
+    def test_unwatched_files_ignored(self):
+        # Temporary files in the same directories also cause events
+        self.watcher._on_event(StubEvent(self.settings_path + '.tmp'))
+        self.watcher._on_event(StubEvent(os.path.join(self.tmp_dir, 'other')))
+
+        self.assertEqual(self.events, [])
+
+    def test_failing_subscriber(self):
+        def fail(event):
+            raise ValueError()
+
+        self.watcher.unsubscribe(watcher.BOOT_CONFIG_CHANGED, self.events.append)
+        self.watcher.subscribe(watcher.BOOT_CONFIG_CHANGED, fail)
+        self.watcher.subscribe(watcher.BOOT_CONFIG_CHANGED, self.events.append)
+        self.watcher._on_event(StubEvent(self.config_path))
+
+        self.assertEqual(len(self.events), 1)
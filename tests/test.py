@@ -19,7 +19,22 @@ sys.path.insert(1, os.path.abspath(
 
 SUITE = unittest.TestSuite()
 TESTS = [
-    'tests.i18n.test_locale'
+    'tests.i18n.test_locale',
+    'tests.boot_config.test_boot_config',
+    'tests.boot_config.test_line_matcher',
+    'tests.settings.test_settings_schema',
+    'tests.settings.test_settings_store',
+    'tests.settings.test_watcher',
+    'tests.settings.test_settings_document',
+    'tests.display.test_edid',
+    'tests.display.test_display_rules',
+    'tests.display.test_screen_history',
+    'tests.display.test_display_probe',
+    'tests.profiler.test_profiler',
+    'tests.overclock.test_overclock_bench',
+    'tests.overclock.test_board',
+    'tests.overclock.test_cpufreq',
+    'tests.overclock.test_clock_migration'
 ]
 
 for test in TESTS: